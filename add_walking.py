@@ -1,5 +1,8 @@
 import json
 
+from build_graph import dedupe_walking_pairs
+from json_io import dump_json
+
 walking_pairs = [
     ("有楽町", "日比谷"),
     ("御茶ノ水", "新御茶ノ水"),
@@ -48,16 +51,19 @@ def add_walking_connections(graph_path: str, output_path: str):
     with open(graph_path, "r", encoding="utf-8") as f:
         graph = json.load(f)
 
+    # 駅ごとの既存接続 (接続先, 路線) を集合で持ち、重複チェックを定数時間にする
+    existing = {
+        station: {(conn["station"], conn["line"]) for conn in data.get("edges", [])}
+        for station, data in graph.items()
+    }
+
     def ensure_entry(station_name):
         if station_name not in graph:
             graph[station_name] = []
+            existing[station_name] = set()
 
     def connection_exists(from_station, to_station):
-        print(from_station, to_station)
-        return any(
-            conn["station"] == to_station and conn["line"] == "徒歩"
-            for conn in graph[from_station].get("edges", [])
-        )
+        return (to_station, "徒歩") in existing[from_station]
 
     def add_connection(from_station, to_station):
         ensure_entry(from_station)
@@ -67,13 +73,14 @@ def add_walking_connections(graph_path: str, output_path: str):
             graph[from_station]["edges"].append(
                 {"station": to_station, "line": "徒歩", "station_cd": "", "line_cd": ""}
             )
+            existing[from_station].add((to_station, "徒歩"))
 
-    for s1, s2 in walking_pairs:
+    # 接続は両方向に追加するので、向きだけが異なる重複ペアは除く
+    for s1, s2 in dedupe_walking_pairs(walking_pairs):
         add_connection(s1, s2)
         add_connection(s2, s1)
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(graph, f, ensure_ascii=False, indent=2)
+    dump_json(graph, output_path)
 
     print(f"徒歩接続を追加して {output_path} に保存しました。")
 
@@ -1,22 +1,45 @@
 import argparse
 import json
-from collections import defaultdict
+import sys
+from functools import lru_cache
 
 import pandas as pd
 
+from json_io import dump_json
+
 
 def normalize_name(name: str, name_map: dict) -> str:
     return name_map.get(name, name)
 
 
-def apply_replacement_rules(station_name: str, line_cds: set, replacement_rules: list, major_lines: dict) -> str:
+def index_replacement_rules(replacement_rules: list) -> dict:
+    """
+    replacement_rulesをtarget駅名で引ける形に変換する
+
+    Args:
+        replacement_rules: 置換ルールのリスト
+
+    Returns:
+        target駅名 -> [(ルールに書かれた路線コードのfrozenset, 置換後の駅名), ...] のdict
+    """
+    return {
+        rule["target"]: [
+            (frozenset(line_rule["lines"]), line_rule["dest"])
+            for line_rule in rule["rules"]
+        ]
+        # 同じtargetのルールが複数あれば、元の照合順どおり先に書かれたものを使う
+        for rule in reversed(replacement_rules)
+    }
+
+
+def apply_replacement_rules(station_name: str, line_cds: frozenset, rules_by_target: dict, major_lines: dict) -> str:
     """
     駅名に対してreplacement_rulesを適用する
     
     Args:
         station_name: 対象の駅名
-        line_cds: その駅が通っている路線コードのset
-        replacement_rules: 置換ルールのリスト
+        line_cds: その駅が通っている路線コード(文字列)のfrozenset
+        rules_by_target: index_replacement_rulesで変換した置換ルール
         major_lines: 有効な路線コードのdict
         
     Returns:
@@ -25,105 +48,174 @@ def apply_replacement_rules(station_name: str, line_cds: set, replacement_rules:
     Raises:
         ValueError: targetにマッチしたがどのruleにもマッチしなかった場合
     """
-    for rule in replacement_rules:
-        if station_name == rule["target"]:
-            for line_rule in rule["rules"]:
-                rule_line_cds = set(line_rule["lines"])
-                # その駅が通っている路線コードを文字列に変換
-                station_line_cds = {str(cd) for cd in line_cds}
-                if rule_line_cds.intersection(station_line_cds):
-                    return line_rule["dest"]
-            # targetにマッチしたがどのruleにもマッチしなかった場合
-            # デバッグ情報として文字列変換した路線コードも表示
-            valid_line_cds_str = {str(cd) for cd in line_cds if str(cd) in major_lines}
-            raise ValueError(f"Station '{station_name}' matched target but no replacement rule matched. Line codes: {line_cds}, Valid line codes: {valid_line_cds_str}")
-    return station_name
-
-
-def build_base_graph(config: dict, stations, joins, lines):
-    major_lines = config["lines"]
+    rules = rules_by_target.get(station_name)
+    if rules is None:
+        return station_name
+
+    for rule_line_cds, dest in rules:
+        if not rule_line_cds.isdisjoint(line_cds):
+            return dest
+    # targetにマッチしたがどのruleにもマッチしなかった場合
+    # デバッグ情報として有効な路線コードも表示
+    valid_line_cds_str = {cd for cd in line_cds if cd in major_lines}
+    raise ValueError(f"Station '{station_name}' matched target but no replacement rule matched. Line codes: {line_cds}, Valid line codes: {valid_line_cds_str}")
+
+
+def build_base_graph(config: dict, stations, joins):
+    # 駅名・路線名は全エッジで繰り返し使われるのでinternして同一オブジェクトを共有する
+    major_lines = {line_cd: sys.intern(name) for line_cd, name in config["lines"].items()}
     normalize_name_map = config["normalize_name_map"]
-    replacement_rules = config.get("replacement_rules", [])
+    rules_by_target = index_replacement_rules(config.get("replacement_rules", []))
     valid_pref_cds = set(config["valid_pref_cds"])
 
     filtered_stations = stations[stations["pref_cd"].isin(valid_pref_cds)]
-    cd_to_name = filtered_stations.set_index("station_cd")["station_name"].to_dict()
+    cd_to_name = {
+        cd: sys.intern(name)
+        for cd, name in filtered_stations.set_index("station_cd")["station_name"].items()
+    }
     valid_station_cds = set(cd_to_name.keys())
 
     station_pos = filtered_stations.set_index("station_cd")[["lon", "lat"]].to_dict(
         orient="index"
     )
 
-    # 各駅が通っている路線コードを事前に計算
-    station_lines = defaultdict(set)
-    for _, row in joins.iterrows():
-        cd1, cd2, line_cd = row["station_cd1"], row["station_cd2"], row["line_cd"]
-        if cd1 in valid_station_cds and cd2 in valid_station_cds:
-            station_lines[cd1].add(line_cd)
-            station_lines[cd2].add(line_cd)
-
-    graph = defaultdict(lambda: {"lat": None, "lon": None, "edges": []})
-
-    for _, row in joins.iterrows():
-        cd1, cd2, line_cd = row["station_cd1"], row["station_cd2"], row["line_cd"]
-
-        if cd1 in valid_station_cds and cd2 in valid_station_cds:
-            name1 = normalize_name(cd_to_name[cd1], normalize_name_map)
-            name2 = normalize_name(cd_to_name[cd2], normalize_name_map)
-            
-            # replacement_rulesを適用
-            name1 = apply_replacement_rules(name1, station_lines[cd1], replacement_rules, major_lines)
-            name2 = apply_replacement_rules(name2, station_lines[cd2], replacement_rules, major_lines)
-
-            if str(line_cd) not in major_lines:
-                continue
-
-            line_name = major_lines[str(line_cd)]
-
-            if graph[name1]["lat"] is None or graph[name1]["lon"] is None:
-                pos1 = station_pos.get(cd1)
-                if pos1:
-                    graph[name1]["lat"] = pos1["lat"]
-                    graph[name1]["lon"] = pos1["lon"]
-
-            if graph[name2]["lat"] is None or graph[name2]["lon"] is None:
-                pos2 = station_pos.get(cd2)
-                if pos2:
-                    graph[name2]["lat"] = pos2["lat"]
-                    graph[name2]["lon"] = pos2["lon"]
-
-            graph[name1]["edges"].append(
-                {
-                    "station": name2,
-                    "line": line_name,
-                    "station_cd": str(cd2),
-                    "line_cd": str(line_cd),
-                }
-            )
-            graph[name2]["edges"].append(
-                {
-                    "station": name1,
-                    "line": line_name,
-                    "station_cd": str(cd1),
-                    "line_cd": str(line_cd),
-                }
-            )
+    # 両端が対象エリア内の接続のみに絞り込む
+    valid_joins = joins[
+        joins["station_cd1"].isin(valid_station_cds)
+        & joins["station_cd2"].isin(valid_station_cds)
+    ]
+
+    # 各駅が通っている路線コードを事前に計算（ルール照合用に文字列化しておく）
+    station_lines = (
+        pd.concat(
+            [
+                valid_joins[["station_cd1", "line_cd"]].rename(columns={"station_cd1": "station_cd"}),
+                valid_joins[["station_cd2", "line_cd"]].rename(columns={"station_cd2": "station_cd"}),
+            ]
+        )
+        .astype({"line_cd": str})
+        .groupby("station_cd")["line_cd"]
+        .apply(frozenset)
+        .to_dict()
+    )
+
+    # 同じ駅は多数の接続に現れるので、駅名と路線コードの組ごとに結果を使い回す
+    @lru_cache(maxsize=None)
+    def resolve_name(station_name: str, line_cds: frozenset) -> str:
+        return apply_replacement_rules(station_name, line_cds, rules_by_target, major_lines)
+
+    # 対象路線外の接続にしか現れない駅にもルールを適用し、ルールの漏れ(ValueError)を検出する
+    for station_cd, line_cds_of_station in station_lines.items():
+        resolve_name(
+            sys.intern(normalize_name(cd_to_name[station_cd], normalize_name_map)),
+            line_cds_of_station,
+        )
+
+    # 対象路線の接続のみ残し、駅名・路線名は列単位でまとめて変換する
+    major_joins = valid_joins[valid_joins["line_cd"].astype(str).isin(major_lines)]
+    names1 = major_joins["station_cd1"].map(cd_to_name).map(
+        lambda name: sys.intern(normalize_name(name, normalize_name_map))
+    )
+    names2 = major_joins["station_cd2"].map(cd_to_name).map(
+        lambda name: sys.intern(normalize_name(name, normalize_name_map))
+    )
+    line_cds = major_joins["line_cd"].astype(str)
+    line_names = line_cds.map(major_lines)
+    # エッジに載せる駅コードも列単位で文字列化しておく
+    station_cds1 = major_joins["station_cd1"].astype(str)
+    station_cds2 = major_joins["station_cd2"].astype(str)
+
+    graph = {}
+
+    for cd1, cd2, cd1_str, cd2_str, line_cd, name1, name2, line_name in zip(
+        major_joins["station_cd1"].values,
+        major_joins["station_cd2"].values,
+        station_cds1.values,
+        station_cds2.values,
+        line_cds.values,
+        names1.values,
+        names2.values,
+        line_names.values,
+    ):
+        # replacement_rulesを適用
+        name1 = resolve_name(name1, station_lines[cd1])
+        name2 = resolve_name(name2, station_lines[cd2])
+
+        node1 = graph.get(name1)
+        if node1 is None:
+            node1 = graph[name1] = {"lat": None, "lon": None, "edges": []}
+        node2 = graph.get(name2)
+        if node2 is None:
+            node2 = graph[name2] = {"lat": None, "lon": None, "edges": []}
+
+        if node1["lat"] is None or node1["lon"] is None:
+            pos1 = station_pos.get(cd1)
+            if pos1:
+                node1["lat"] = pos1["lat"]
+                node1["lon"] = pos1["lon"]
+
+        if node2["lat"] is None or node2["lon"] is None:
+            pos2 = station_pos.get(cd2)
+            if pos2:
+                node2["lat"] = pos2["lat"]
+                node2["lon"] = pos2["lon"]
+
+        # 構築中のエッジは (駅名, 路線名, 駅コード, 路線コード) のタプルで持つ
+        node1["edges"].append((name2, line_name, cd2_str, line_cd))
+        node2["edges"].append((name1, line_name, cd1_str, line_cd))
+
+    # 出力形式のdictへまとめて変換する
+    for node in graph.values():
+        node["edges"] = [
+            {
+                "station": station,
+                "line": line,
+                "station_cd": station_cd,
+                "line_cd": edge_line_cd,
+            }
+            for station, line, station_cd, edge_line_cd in node["edges"]
+        ]
 
     return graph
 
 
+def dedupe_walking_pairs(walking_pairs: list) -> list:
+    """
+    向きだけが異なる重複ペアを除き、最初に現れた順序で返す
+
+    Args:
+        walking_pairs: 徒歩接続する駅名ペアのリスト
+
+    Returns:
+        重複を除いた (駅名, 駅名) タプルのリスト
+    """
+    seen = set()
+    unique_pairs = []
+    for s1, s2 in walking_pairs:
+        key = frozenset((s1, s2))
+        if key not in seen:
+            seen.add(key)
+            unique_pairs.append((s1, s2))
+    return unique_pairs
+
+
 def add_walking_connections(graph: dict, walking_pairs: list) -> dict:
+    # 駅ごとの既存接続 (接続先, 路線) を集合で持ち、重複チェックを定数時間にする
+    existing = {
+        station: {(conn["station"], conn["line"]) for conn in data.get("edges", [])}
+        for station, data in graph.items()
+    }
+
     def ensure_entry(station_name):
         if station_name not in graph:
             graph[station_name] = {"lat": None, "lon": None, "edges": []}
+            existing[station_name] = set()
 
     def connection_exists(from_station, to_station):
-        return any(
-            conn["station"] == to_station and conn["line"] == "徒歩"
-            for conn in graph[from_station].get("edges", [])
-        )
+        return (to_station, "徒歩") in existing[from_station]
 
-    for s1, s2 in walking_pairs:
+    # 両方向の接続は1ペアで追加するので、逆向きの重複ペアは除いておく
+    for s1, s2 in dedupe_walking_pairs(walking_pairs):
         ensure_entry(s1)
         ensure_entry(s2)
 
@@ -136,6 +228,7 @@ def add_walking_connections(graph: dict, walking_pairs: list) -> dict:
                     "line_cd": "",
                 }
             )
+            existing[s1].add((s2, "徒歩"))
 
         if not connection_exists(s2, s1):
             graph[s2]["edges"].append(
@@ -146,33 +239,41 @@ def add_walking_connections(graph: dict, walking_pairs: list) -> dict:
                     "line_cd": "",
                 }
             )
+            existing[s2].add((s1, "徒歩"))
 
     return graph
 
 
-def main(config_path: str, base_output: str, walking_output: str):
-    # 入力ファイル
-    stations = pd.read_csv("data/v2/station.csv")
-    joins = pd.read_csv("data/v2/join.csv")
-    lines = pd.read_csv("data/v2/line.csv")
+def main(config_path: str, base_output: str, walking_output: str, skip_base: bool = False):
+    # 入力ファイル（使う列だけを読み込む）
+    stations = pd.read_csv(
+        "data/v2/station.csv",
+        usecols=["station_cd", "station_name", "pref_cd", "lon", "lat"],
+        dtype={"station_cd": "int64", "pref_cd": "int16"},
+    )
+    joins = pd.read_csv(
+        "data/v2/join.csv",
+        usecols=["line_cd", "station_cd1", "station_cd2"],
+        dtype={"line_cd": "int32", "station_cd1": "int64", "station_cd2": "int64"},
+    )
 
     # 設定ファイル読み込み
     with open(config_path, encoding="utf-8") as f:
         config = json.load(f)
 
     # ベースグラフ構築
-    graph = build_base_graph(config, stations, joins, lines)
+    graph = build_base_graph(config, stations, joins)
 
-    with open(base_output, "w", encoding="utf-8") as f:
-        json.dump(graph, f, ensure_ascii=False, indent=2)
-    print(f"✅ ベースグラフを {base_output} に保存しました。")
+    # 徒歩接続グラフだけ必要な場合はベースグラフの書き出しを省略する
+    if not skip_base:
+        dump_json(graph, base_output)
+        print(f"✅ ベースグラフを {base_output} に保存しました。")
 
     # 徒歩接続追加
     walking_pairs = config.get("walking_pairs", [])
     graph_with_walking = add_walking_connections(graph, walking_pairs)
 
-    with open(walking_output, "w", encoding="utf-8") as f:
-        json.dump(graph_with_walking, f, ensure_ascii=False, indent=2)
+    dump_json(graph_with_walking, walking_output)
     print(f"🚶 徒歩接続グラフを {walking_output} に保存しました。")
 
 
@@ -187,6 +288,11 @@ if __name__ == "__main__":
         default="graph_with_pos_walking.json",
         help="徒歩接続グラフ出力先",
     )
+    parser.add_argument(
+        "--skip_base",
+        action="store_true",
+        help="ベースグラフを出力せず徒歩接続グラフのみ出力する",
+    )
 
     args = parser.parse_args()
-    main(args.config, args.base_output, args.walking_output)
+    main(args.config, args.base_output, args.walking_output, args.skip_base)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+駅グラフ(JSON)をCSR形式に変換し、キャッシュファイル(.csr)として保存するスクリプト
+
+キャッシュはグラフJSONと同じ場所に保存され、JSONより新しければ
+generate_quiz.py / generate_guess_problems.py がJSONの代わりに読み込む
+
+Usage:
+    python build_graph_cache.py
+    python build_graph_cache.py output/graph_tokyo_walking.json
+"""
+
+import argparse
+from pathlib import Path
+
+from graph_csr import CACHE_SUFFIX, build_csr, save_csr
+from json_io import load_json
+
+DEFAULT_GRAPH_FILES = [
+    "output/graph_tokyo_walking.json",
+    "output/graph_osaka_walking.json",
+    "output/graph_nagoya_walking.json",
+]
+
+
+def build_graph_cache(graph_file):
+    """
+    グラフJSONからキャッシュファイルを生成
+
+    Args:
+        graph_file: グラフJSONのパス
+
+    Returns:
+        キャッシュファイルのパス
+    """
+    graph = build_csr(load_json(graph_file))
+    cache_path = Path(graph_file).with_suffix(CACHE_SUFFIX)
+    save_csr(graph, cache_path)
+
+    print(f"✅ {graph_file} → {cache_path} ({len(graph.names)}駅, {len(graph.indices)}エッジ)")
+    return cache_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="駅グラフのCSRキャッシュを生成")
+    parser.add_argument(
+        "graph_files",
+        nargs="*",
+        default=DEFAULT_GRAPH_FILES,
+        help="グラフJSONのパス（未指定の場合は徒歩接続付きの全グラフ）",
+    )
+    args = parser.parse_args()
+
+    for graph_file in args.graph_files:
+        build_graph_cache(graph_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -37,7 +37,7 @@ for area_key, area_info in area_data.items():
 
     # graph に含まれない駅のチェック
     used_stations = start_set | goal_set | set(area_info.get("expansion", []))
-    missing_stations = [station for station in used_stations if station not in graph]
+    missing_stations = list(used_stations - graph.keys())
 
     if missing_stations:
         missing_stations_total[area_key] = missing_stations
@@ -3,24 +3,22 @@
 line.csvから路線情報を読み込み、各路線の駅リストを繋がっている順番で出力するスクリプト
 """
 
-import json
 import pandas as pd
 from collections import defaultdict
 import sys
 import argparse
 from pathlib import Path
 
+from json_io import dump_json
+
+
 def load_lines_from_csv():
     """line.csvから路線情報を読み込む"""
     data_dir = Path('data/v2')
-    lines_df = pd.read_csv(data_dir / 'line.csv')
+    lines_df = pd.read_csv(data_dir / 'line.csv', usecols=['line_cd', 'line_name'])
     
     # 路線コードと路線名の辞書を作成
-    lines_dict = {}
-    for _, row in lines_df.iterrows():
-        line_cd = str(row['line_cd'])
-        line_name = row['line_name']
-        lines_dict[line_cd] = line_name
+    lines_dict = dict(zip(lines_df['line_cd'].astype(str), lines_df['line_name']))
     
     return lines_dict
 
@@ -29,10 +27,18 @@ def load_data():
     data_dir = Path('data/v2')
     
     # 駅データ
-    stations_df = pd.read_csv(data_dir / 'station.csv')
+    stations_df = pd.read_csv(
+        data_dir / 'station.csv',
+        usecols=['station_cd', 'station_name', 'pref_cd'],
+        dtype={'station_cd': 'int64', 'pref_cd': 'int16'},
+    )
     
     # 路線接続データ
-    join_df = pd.read_csv(data_dir / 'join.csv')
+    join_df = pd.read_csv(
+        data_dir / 'join.csv',
+        usecols=['line_cd', 'station_cd1', 'station_cd2'],
+        dtype={'line_cd': 'int32', 'station_cd1': 'int64', 'station_cd2': 'int64'},
+    )
     
     # 路線データ
     lines_dict = load_lines_from_csv()
@@ -41,16 +47,18 @@ def load_data():
 
 def build_line_graph(join_df):
     """路線ごとの駅接続グラフを構築"""
-    line_graphs = defaultdict(lambda: defaultdict(list))
+    line_graphs = {}
     
-    for _, row in join_df.iterrows():
-        line_cd = str(row['line_cd'])
-        station1 = str(row['station_cd1'])
-        station2 = str(row['station_cd2'])
-        
-        # 双方向に接続を追加
-        line_graphs[line_cd][station1].append(station2)
-        line_graphs[line_cd][station2].append(station1)
+    # コードは最初にまとめて文字列化しておく
+    joins = join_df[['line_cd', 'station_cd1', 'station_cd2']].astype(str)
+    
+    for line_cd, group in joins.groupby('line_cd', sort=False):
+        line_graph = defaultdict(list)
+        for station1, station2 in zip(group['station_cd1'].values, group['station_cd2'].values):
+            # 双方向に接続を追加
+            line_graph[station1].append(station2)
+            line_graph[station2].append(station1)
+        line_graphs[line_cd] = line_graph
     
     return line_graphs
 
@@ -64,7 +72,7 @@ def trace_line_path(line_graph):
     
     if not endpoints:
         # 環状線の場合、適当な駅から開始
-        start_station = list(line_graph.keys())[0]
+        start_station = next(iter(line_graph))
     else:
         start_station = endpoints[0]
     
@@ -74,27 +82,25 @@ def trace_line_path(line_graph):
     current = start_station
     
     while True:
-        next_stations = [s for s in line_graph[current] if s not in visited]
+        # 未訪問の隣接駅を先頭から1つだけ探す（リストは作らない）
+        next_station = next((s for s in line_graph[current] if s not in visited), None)
         
-        if not next_stations:
+        if next_station is None:
             break
             
-        next_station = next_stations[0]
         path.append(next_station)
         visited.add(next_station)
         current = next_station
     
     return path
 
-def get_station_name(station_cd, stations_df):
+def build_station_name_map(stations_df):
+    """駅コードから駅名を引く辞書を作成"""
+    return dict(zip(stations_df['station_cd'].astype(int), stations_df['station_name']))
+
+def get_station_name(station_cd, station_name_map):
     """駅コードから駅名を取得"""
-    station_row = stations_df[stations_df['station_cd'] == int(station_cd)]
-    if station_row.empty:
-        return f"不明駅({station_cd})"
-    
-    station_name = station_row.iloc[0]['station_name']
-    
-    return station_name
+    return station_name_map.get(int(station_cd), f"不明駅({station_cd})")
 
 def filter_stations_by_pref(stations_df, pref_cds=None):
     """指定した都道府県コードの駅のみをフィルタリング"""
@@ -123,6 +129,9 @@ def main():
     # 路線グラフを構築
     line_graphs = build_line_graph(join_df)
     
+    # 駅名の参照用辞書
+    station_name_map = build_station_name_map(stations_df)
+    
     # 結果を格納するリスト
     result_lines = []
     
@@ -145,7 +154,7 @@ def main():
         # 駅名リストを作成
         stations_list = []
         for i, station_cd in enumerate(filtered_station_path):
-            station_name = get_station_name(station_cd, stations_df)
+            station_name = get_station_name(station_cd, station_name_map)
             stations_list.append({
                 "order": i + 1,
                 "name": station_name
@@ -165,8 +174,7 @@ def main():
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
     # JSONファイルとして出力
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(result_lines, f, ensure_ascii=False, indent=2)
+    dump_json(result_lines, output_path)
     
     print(f"出力完了: {output_path} ({len(result_lines)}路線)", file=sys.stderr)
 
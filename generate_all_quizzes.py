@@ -10,11 +10,16 @@ Usage:
 """
 
 import argparse
+import io
 import json
 import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from pathlib import Path
 from datetime import datetime
 from generate_quiz import generate_multiple_quizzes
+from json_io import BackgroundWriter, dump_json, dumps_json, load_json
 
 
 def get_available_areas():
@@ -25,8 +30,7 @@ def get_available_areas():
         エリア名のリスト
     """
     try:
-        with open('area.json', 'r', encoding='utf-8') as f:
-            area_data = json.load(f)
+        area_data = load_json('area.json')
         return list(area_data.keys())
     except FileNotFoundError:
         print("❌ area.json が見つかりません")
@@ -36,16 +40,63 @@ def get_available_areas():
         return []
 
 
-def generate_all_area_quizzes(areas=None, iterations=10, output_dir=".", verbose=True, min_max_components=4):
+def summarize_max_components(quizzes):
+    """
+    クイズの最大連結成分数の最小・最大・平均を1回の走査で求める
+    
+    Args:
+        quizzes: クイズのリスト（1件以上）
+        
+    Returns:
+        {"min": int, "max": int, "avg": float}
+    """
+    minimum = maximum = quizzes[0]["max_connected_components"]
+    total = 0
+    for quiz in quizzes:
+        value = quiz["max_connected_components"]
+        if value < minimum:
+            minimum = value
+        elif value > maximum:
+            maximum = value
+        total += value
+    
+    return {"min": minimum, "max": maximum, "avg": total / len(quizzes)}
+
+
+def _generate_area_quizzes(area, iterations, min_max_components):
+    """
+    1エリア分のクイズを生成する（ワーカープロセスで実行される）
+    
+    Args:
+        area: エリア名
+        iterations: クイズ数
+        min_max_components: 最大連結成分数の下限
+        
+    Returns:
+        クイズのリスト, 生成中の出力ログ
+    """
+    # fork元と同じ乱数列にならないよう、ワーカーごとに乱数を初期化し直す
+    random.seed()
+    
+    log = io.StringIO()
+    with redirect_stdout(log):
+        quizzes = generate_multiple_quizzes(area, iterations, min_max_components)
+    return quizzes, log.getvalue()
+
+
+def generate_all_area_quizzes(areas=None, iterations=10, output_dir=".", verbose=True, min_max_components=4, max_workers=None):
     """
     指定されたエリアのクイズを全て生成
     
+    エリアごとの生成は独立しているため、プロセスプールで並列に実行する
+    
     Args:
         areas: 生成するエリアのリスト (None の場合は全エリア)
         iterations: 各エリアのクイズ数
         output_dir: 出力ディレクトリ
         verbose: 詳細出力の有無
         min_max_components: 最大連結成分数の下限
+        max_workers: 並列プロセス数 (None の場合はCPUコア数)
         
     Returns:
         生成結果の辞書 {area_name: {"success": bool, "count": int, "filename": str}}
@@ -69,7 +120,8 @@ def generate_all_area_quizzes(areas=None, iterations=10, output_dir=".", verbose
         return {}
     
     # 出力ディレクトリを作成
-    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
     
     results = {}
     total_quizzes = 0
@@ -77,61 +129,82 @@ def generate_all_area_quizzes(areas=None, iterations=10, output_dir=".", verbose
     print(f"🎯 {len(areas)}エリアで各{iterations}個のクイズを生成開始")
     print("=" * 60)
     
-    for i, area in enumerate(areas, 1):
-        if verbose:
-            print(f"\n📍 エリア {i}/{len(areas)}: {area}")
-            print("-" * 40)
+    # 出力ファイルは結果が届いた順に別スレッドで書き込み、次のエリアの処理と重ねる
+    pending_writes = {}
+    with BackgroundWriter() as writer, ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_generate_area_quizzes, area, iterations, min_max_components)
+            for area in areas
+        ]
         
-        try:
-            # クイズ生成
-            quizzes = generate_multiple_quizzes(area, iterations, min_max_components)
+        # 結果はエリアの順番通りに受け取り、ログもまとめて表示する
+        for i, (area, future) in enumerate(zip(areas, futures), 1):
+            if verbose:
+                print(f"\n📍 エリア {i}/{len(areas)}: {area}")
+                print("-" * 40)
             
-            if quizzes and len(quizzes) > 0:
-                # ファイル名生成
-                filename = f"quizzes_{area}.json"
-                filepath = Path(output_dir) / filename
-                
-                # JSONファイルに保存
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    json.dump(quizzes, f, ensure_ascii=False, indent=2)
+            try:
+                # クイズ生成
+                quizzes, log = future.result()
+                if verbose:
+                    print(log, end="")
                 
-                results[area] = {
-                    "success": True,
-                    "count": len(quizzes),
-                    "filename": str(filepath),
-                    "max_components_range": {
-                        "min": min(q["max_connected_components"] for q in quizzes),
-                        "max": max(q["max_connected_components"] for q in quizzes),
-                        "avg": sum(q["max_connected_components"] for q in quizzes) / len(quizzes)
+                if quizzes and len(quizzes) > 0:
+                    # ファイル名生成
+                    filename = f"quizzes_{area}.json"
+                    filepath = output_path / filename
+                    
+                    # JSONファイル保存（書き込みは別スレッドで行う）
+                    pending_writes[area] = writer.submit(filepath, dumps_json(quizzes))
+                    
+                    results[area] = {
+                        "success": True,
+                        "count": len(quizzes),
+                        "filename": str(filepath),
+                        "max_components_range": summarize_max_components(quizzes)
+                    }
+                    
+                    total_quizzes += len(quizzes)
+                    
+                    if verbose:
+                        print(f"✅ {area}: {len(quizzes)}個のクイズを生成")
+                        print(f"   ファイル: {filepath}")
+                        range_info = results[area]["max_components_range"]
+                        print(f"   連結成分数: {range_info['min']}-{range_info['max']} (平均{range_info['avg']:.1f})")
+                else:
+                    results[area] = {
+                        "success": False,
+                        "count": 0,
+                        "filename": None,
+                        "error": "クイズ生成失敗"
                     }
+                    if verbose:
+                        print(f"❌ {area}: クイズ生成失敗")
+            
+            except Exception as e:
+                results[area] = {
+                    "success": False,
+                    "count": 0,
+                    "filename": None,
+                    "error": str(e)
                 }
-                
-                total_quizzes += len(quizzes)
-                
                 if verbose:
-                    print(f"✅ {area}: {len(quizzes)}個のクイズを生成")
-                    print(f"   ファイル: {filepath}")
-                    range_info = results[area]["max_components_range"]
-                    print(f"   連結成分数: {range_info['min']}-{range_info['max']} (平均{range_info['avg']:.1f})")
-            else:
+                    print(f"❌ {area}: エラー - {e}")
+        
+        # 書き込みに失敗したエリアは、そのエリアだけ失敗として記録する
+        for area, write_future in pending_writes.items():
+            try:
+                writer.wait(write_future)
+            except Exception as e:
+                total_quizzes -= results[area]["count"]
                 results[area] = {
                     "success": False,
                     "count": 0,
                     "filename": None,
-                    "error": "クイズ生成失敗"
+                    "error": str(e)
                 }
                 if verbose:
-                    print(f"❌ {area}: クイズ生成失敗")
-        
-        except Exception as e:
-            results[area] = {
-                "success": False,
-                "count": 0,
-                "filename": None,
-                "error": str(e)
-            }
-            if verbose:
-                print(f"❌ {area}: エラー - {e}")
+                    print(f"❌ {area}: 書き込みエラー - {e}")
     
     # 生成結果のサマリー
     if verbose:
@@ -184,8 +257,7 @@ def create_summary_report(results, output_dir=".", timestamp=None):
     
     # サマリーファイル保存
     summary_file = Path(output_dir) / f"quiz_generation_summary_{timestamp}.json"
-    with open(summary_file, 'w', encoding='utf-8') as f:
-        json.dump(report, f, ensure_ascii=False, indent=2)
+    dump_json(report, summary_file)
     
     print(f"\n📋 サマリーレポート: {summary_file}")
     return str(summary_file)
@@ -248,6 +320,12 @@ def main():
         help="最大連結成分数の下限 (デフォルト: 4)"
     )
     
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="並列プロセス数 (デフォルト: CPUコア数)"
+    )
+    
     args = parser.parse_args()
     
     # エリア一覧表示
@@ -271,7 +349,8 @@ def main():
         iterations=args.iterations,
         output_dir=args.output,
         verbose=not args.quiet,
-        min_max_components=args.min_components
+        min_max_components=args.min_components,
+        max_workers=args.workers
     )
     
     # サマリーレポート作成
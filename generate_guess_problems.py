@@ -9,12 +9,20 @@ Usage:
 """
 
 import argparse
+import io
 import json
 import random
-from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from datetime import datetime
 from pathlib import Path
 
+from graph_csr import CsrGraph, bfs_distances, load_graph
+from json_io import BackgroundWriter, dump_json, dumps_json, load_json
+
+# グラフファイルごとのCSR変換結果（東京の各エリアで同じグラフを共有する）
+_graph_cache: dict[str, CsrGraph] = {}
+
 
 def load_data(area_key="central"):
     """
@@ -24,10 +32,9 @@ def load_data(area_key="central"):
         area_key: エリア名
 
     Returns:
-        area_data, graph_data
+        area_data, graph（CSR形式）
     """
-    with open("area.json", "r", encoding="utf-8") as f:
-        area_data = json.load(f)
+    area_data = load_json("area.json")
 
     # エリアに応じたグラフファイルを選択
     graph_file_map = {
@@ -43,75 +50,54 @@ def load_data(area_key="central"):
 
     graph_file = graph_file_map.get(area_key, "output/graph_tokyo_walking.json")
 
+    if graph_file in _graph_cache:
+        return area_data, _graph_cache[graph_file]
+
     try:
-        with open(graph_file, "r", encoding="utf-8") as f:
-            graph_data = json.load(f)
+        graph = load_graph(graph_file)
     except FileNotFoundError:
         print(
             f"警告: グラフファイル {graph_file} が見つかりません。東京グラフを使用します。"
         )
-        with open("output/graph_tokyo_walking.json", "r", encoding="utf-8") as f:
-            graph_data = json.load(f)
-
-    return area_data, graph_data
-
-
-def find_shortest_distance(graph, start, end):
-    """
-    2駅間の最短距離（駅数）を計算
-
-    Args:
-        graph: グラフデータ
-        start: 開始駅
-        end: 終了駅
-
-    Returns:
-        最短距離（駅数）、見つからない場合は None
-    """
-    if start == end:
-        return 0
-
-    if start not in graph or end not in graph:
-        return None
-
-    queue = deque([(start, 0)])
-    visited = {start}
+        graph = load_graph("output/graph_tokyo_walking.json")
 
-    while queue:
-        current, distance = queue.popleft()
+    _graph_cache[graph_file] = graph
 
-        # 隣接駅を探索
-        for edge in graph.get(current, {}).get("edges", []):
-            next_station = edge["station"]
+    return area_data, graph
 
-            if next_station == end:
-                return distance + 1
 
-            if next_station not in visited:
-                visited.add(next_station)
-                queue.append((next_station, distance + 1))
-
-    return None
-
-
-def calculate_distances_from_goal(graph, goal_station, start_candidates):
+def calculate_distances_from_goal(
+    graph: CsrGraph, goal_station, start_candidates, max_distance=None
+):
     """
     goal駅から各start候補駅への最短距離を計算
 
     Args:
-        graph: グラフデータ
+        graph: グラフデータ（CSR形式）
         goal_station: goal駅名
         start_candidates: start駅の候補リスト
+        max_distance: 探索する最大距離（None の場合は無制限）
 
     Returns:
-        {start_station: distance} の辞書
+        {start_station: distance} の辞書（max_distance より遠い駅は含まない）
     """
-    distances = {}
+    name_to_id = graph.name_to_id
+    if goal_station not in name_to_id:
+        return {}
+
+    goal_id = name_to_id[goal_station]
+
+    # goal駅から1回だけBFSして、start候補が全て見つかった時点で打ち切る
+    target_ids = frozenset(
+        name_to_id[station] for station in start_candidates if station in name_to_id
+    )
+    dist = bfs_distances(graph.indptr, graph.indices, goal_id, target_ids, max_distance)
 
+    distances = {}
     for start_station in start_candidates:
-        distance = find_shortest_distance(graph, goal_station, start_station)
-        if distance is not None:
-            distances[start_station] = distance
+        start_id = name_to_id.get(start_station)
+        if start_id is not None and dist[start_id] >= 0:
+            distances[start_station] = dist[start_id]
 
     return distances
 
@@ -128,18 +114,24 @@ def select_three_stations_in_range(distances, min_distance=4, max_distance=12):
     Returns:
         選択された3駅のリスト、条件を満たす駅が不足の場合は None
     """
-    # 範囲内の駅を抽出
-    valid_stations = [
-        station
-        for station, distance in distances.items()
-        if min_distance <= distance <= max_distance
-    ]
-
-    if len(valid_stations) < 3:
+    # 範囲内の駅を1回の走査でリザーバーサンプリングし、重複のない3駅を選択
+    selected = []
+    valid_count = 0
+    for station, distance in distances.items():
+        if min_distance <= distance <= max_distance:
+            valid_count += 1
+            if len(selected) < 3:
+                selected.append(station)
+            else:
+                j = random.randrange(valid_count)
+                if j < 3:
+                    selected[j] = station
+
+    if valid_count < 3:
         return None
 
-    # 重複のない3駅を選択
-    selected = random.sample(valid_stations, 3)
+    # random.sample と同様に、選んだ3駅の並び順もランダムにする
+    random.shuffle(selected)
     return selected
 
 
@@ -155,7 +147,7 @@ def analyze_area_distances(area_key="central", min_distance=4, max_distance=12):
     Returns:
         分析結果のリスト
     """
-    area_data, graph_data = load_data(area_key)
+    area_data, graph = load_data(area_key)
 
     if area_key not in area_data:
         print(f"エラー: エリア '{area_key}' が見つかりません")
@@ -164,8 +156,8 @@ def analyze_area_distances(area_key="central", min_distance=4, max_distance=12):
     goal_candidates = area_data[area_key]["goal"]
     start_candidates = area_data[area_key]["start"]
 
-    # goal駅の重複を除去
-    unique_goals = list(set(goal_candidates))
+    # goal駅の重複を除去（元の順番を保ち、シード指定時に結果が再現できるようにする）
+    unique_goals = list(dict.fromkeys(goal_candidates))
 
     print(f"🎯 {area_key}エリアの距離分析開始")
     print(f"📊 goal駅数: {len(unique_goals)}")
@@ -181,14 +173,21 @@ def analyze_area_distances(area_key="central", min_distance=4, max_distance=12):
         print(f"\n🚉 {i}/{len(unique_goals)}: {goal_station}")
 
         # goal駅がグラフに存在するかチェック
-        if goal_station not in graph_data:
+        if goal_station not in graph.name_to_id:
             print(f"⚠️ goal駅 '{goal_station}' がグラフに存在しません - スキップ")
             skipped += 1
             continue
 
+        # 隣接駅のないgoal駅はBFSせずにスキップ
+        if graph.degree(graph.name_to_id[goal_station]) == 0:
+            print(f"⚠️ goal駅 '{goal_station}' に隣接駅がありません - スキップ")
+            skipped += 1
+            continue
+
         # goal駅から各start駅への距離を計算
+        # max_distance より遠い駅は選ばれないので、その深さで探索を打ち切る
         distances = calculate_distances_from_goal(
-            graph_data, goal_station, start_candidates
+            graph, goal_station, start_candidates, max_distance
         )
 
         if not distances:
@@ -240,8 +239,7 @@ def get_available_areas():
         エリア名のリスト
     """
     try:
-        with open("area.json", "r", encoding="utf-8") as f:
-            area_data = json.load(f)
+        area_data = load_json("area.json")
         return list(area_data.keys())
     except FileNotFoundError:
         print("❌ area.json が見つかりません")
@@ -251,21 +249,47 @@ def get_available_areas():
         return []
 
 
-def generate_all_guess_problems(min_distance=4, max_distance=12, seed=None):
+def _analyze_area(area, min_distance, max_distance, seed):
     """
-    全エリアのguess問題を生成してoutput/guess/に保存
+    1エリア分のguess問題を生成する（ワーカープロセスで実行される）
 
     Args:
+        area: エリア名
         min_distance: 最小距離
         max_distance: 最大距離
         seed: ランダムシード
 
+    Returns:
+        分析結果のリスト, 生成中の出力ログ
+    """
+    # シード指定時はエリアごとに固定のシードを使い、並列実行でも再現できるようにする
+    # 未指定時はfork元と同じ乱数列にならないよう初期化し直す
+    random.seed(None if seed is None else f"{seed}-{area}")
+
+    log = io.StringIO()
+    with redirect_stdout(log):
+        area_results = analyze_area_distances(
+            area_key=area, min_distance=min_distance, max_distance=max_distance
+        )
+    return area_results, log.getvalue()
+
+
+def generate_all_guess_problems(min_distance=4, max_distance=12, seed=None, max_workers=None):
+    """
+    全エリアのguess問題を生成してoutput/guess/に保存
+
+    エリアごとの生成は独立しているため、プロセスプールで並列に実行する
+
+    Args:
+        min_distance: 最小距離
+        max_distance: 最大距離
+        seed: ランダムシード（各エリアにはこれから導いたシードを使う）
+        max_workers: 並列プロセス数（None の場合はCPUコア数）
+
     Returns:
         生成結果の辞書
     """
-    # ランダムシード設定
     if seed is not None:
-        random.seed(seed)
         print(f"🎲 ランダムシード: {seed}")
 
     # 利用可能なエリアを取得
@@ -284,50 +308,72 @@ def generate_all_guess_problems(min_distance=4, max_distance=12, seed=None):
 
     results = {}
     total_problems = 0
-
-    for i, area in enumerate(areas, 1):
-        print(f"\n📍 エリア {i}/{len(areas)}: {area}")
-        print("-" * 40)
-
-        try:
-            # guess問題生成
-            area_results = analyze_area_distances(
-                area_key=area, min_distance=min_distance, max_distance=max_distance
-            )
-
-            if area_results:
-                # ファイル保存
-                filename = f"guess_problems_{area}.json"
-                filepath = output_dir / filename
-
-                with open(filepath, "w", encoding="utf-8") as f:
-                    json.dump(area_results, f, ensure_ascii=False, indent=2)
-
+    # 出力ファイルは結果が届いた順に別スレッドで書き込み、次のエリアの処理と重ねる
+    pending_writes = {}
+    with BackgroundWriter() as writer, ProcessPoolExecutor(
+        max_workers=max_workers
+    ) as executor:
+        futures = [
+            executor.submit(_analyze_area, area, min_distance, max_distance, seed)
+            for area in areas
+        ]
+
+        # 結果はエリアの順番通りに受け取り、ログもまとめて表示する
+        for i, (area, future) in enumerate(zip(areas, futures), 1):
+            print(f"\n📍 エリア {i}/{len(areas)}: {area}")
+            print("-" * 40)
+
+            try:
+                # guess問題生成
+                area_results, log = future.result()
+                print(log, end="")
+
+                if area_results:
+                    # ファイル保存
+                    filename = f"guess_problems_{area}.json"
+                    filepath = output_dir / filename
+
+                    pending_writes[area] = writer.submit(filepath, dumps_json(area_results))
+
+                    results[area] = {
+                        "success": True,
+                        "count": len(area_results),
+                        "filename": str(filepath),
+                    }
+
+                    total_problems += len(area_results)
+                    print(f"✅ {area}: {len(area_results)}問題を生成 → {filepath}")
+                else:
+                    results[area] = {
+                        "success": False,
+                        "count": 0,
+                        "filename": None,
+                        "error": "問題生成失敗",
+                    }
+                    print(f"❌ {area}: 問題生成失敗")
+
+            except Exception as e:
                 results[area] = {
-                    "success": True,
-                    "count": len(area_results),
-                    "filename": str(filepath),
+                    "success": False,
+                    "count": 0,
+                    "filename": None,
+                    "error": str(e),
                 }
-
-                total_problems += len(area_results)
-                print(f"✅ {area}: {len(area_results)}問題を生成 → {filepath}")
-            else:
+                print(f"❌ {area}: エラー - {e}")
+
+        # 書き込みに失敗したエリアは、そのエリアだけ失敗として記録する
+        for area, write_future in pending_writes.items():
+            try:
+                writer.wait(write_future)
+            except Exception as e:
+                total_problems -= results[area]["count"]
                 results[area] = {
                     "success": False,
                     "count": 0,
                     "filename": None,
-                    "error": "問題生成失敗",
+                    "error": str(e),
                 }
-                print(f"❌ {area}: 問題生成失敗")
-
-        except Exception as e:
-            results[area] = {
-                "success": False,
-                "count": 0,
-                "filename": None,
-                "error": str(e),
-            }
-            print(f"❌ {area}: エラー - {e}")
+                print(f"❌ {area}: 書き込みエラー - {e}")
 
     # 生成結果のサマリー
     print("\n" + "=" * 60)
@@ -368,8 +414,7 @@ def generate_all_guess_problems(min_distance=4, max_distance=12, seed=None):
     }
 
     summary_file = output_dir / "summary.json"
-    with open(summary_file, "w", encoding="utf-8") as f:
-        json.dump(summary_data, f, ensure_ascii=False, indent=2)
+    dump_json(summary_data, summary_file)
 
     print(f"\n📋 サマリーファイル: {summary_file}")
 
@@ -403,6 +448,10 @@ def main():
 
     parser.add_argument("--seed", type=int, help="ランダムシード（再現性のため）")
 
+    parser.add_argument(
+        "--workers", type=int, help="全エリア生成時の並列プロセス数（デフォルト: CPUコア数）"
+    )
+
     parser.add_argument(
         "--list-areas", action="store_true", help="利用可能なエリアを表示して終了"
     )
@@ -441,8 +490,7 @@ def main():
         filename = f"guess_problems_{args.area}.json"
         filepath = output_dir / filename
 
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        dump_json(results, filepath)
 
         print(f"\n💾 結果を保存: {filepath}")
         print("📋 出力形式: リスト[辞書{goal_station, start_stations, distances}]")
@@ -472,8 +520,7 @@ def main():
         }
 
         summary_file = output_dir / "summary.json"
-        with open(summary_file, "w", encoding="utf-8") as f:
-            json.dump(summary_data, f, ensure_ascii=False, indent=2)
+        dump_json(summary_data, summary_file)
 
         print(f"📋 サマリーファイル: {summary_file}")
     else:
@@ -482,6 +529,7 @@ def main():
             min_distance=args.min_distance,
             max_distance=args.max_distance,
             seed=args.seed,
+            max_workers=args.workers,
         )
 
 
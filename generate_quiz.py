@@ -4,9 +4,22 @@ area.jsonのstartから3駅をランダムにピックし、
 これらを含む最小連結成分を計算して正解の駅を出力するスクリプト
 """
 
-import json
+import io
 import random
-from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, redirect_stdout
+
+from graph_csr import (
+    ComponentTracker,
+    CsrGraph,
+    load_graph,
+    shortest_path,
+    shortest_path_to_any,
+)
+from json_io import dump_json, load_json
+
+# グラフファイルごとのCSR変換結果（東京の各エリアで同じグラフを共有する）
+_graph_cache: dict[str, CsrGraph] = {}
 
 
 def load_data(area_key="central"):
@@ -17,10 +30,9 @@ def load_data(area_key="central"):
         area_key: エリア名
         
     Returns:
-        area_data, graph_data
+        area_data, graph（CSR形式）
     """
-    with open("area.json", "r", encoding="utf-8") as f:
-        area_data = json.load(f)
+    area_data = load_json("area.json")
 
     # エリアに応じたグラフファイルを選択
     graph_file_map = {
@@ -36,23 +48,26 @@ def load_data(area_key="central"):
     
     graph_file = graph_file_map.get(area_key, "output/graph_tokyo_walking.json")
     
+    if graph_file in _graph_cache:
+        return area_data, _graph_cache[graph_file]
+    
     try:
-        with open(graph_file, "r", encoding="utf-8") as f:
-            graph_data = json.load(f)
+        graph = load_graph(graph_file)
     except FileNotFoundError:
         print(f"警告: グラフファイル {graph_file} が見つかりません。東京グラフを使用します。")
-        with open("output/graph_tokyo_walking.json", "r", encoding="utf-8") as f:
-            graph_data = json.load(f)
+        graph = load_graph("output/graph_tokyo_walking.json")
+
+    _graph_cache[graph_file] = graph
 
-    return area_data, graph_data
+    return area_data, graph
 
 
-def find_shortest_path_between_stations(graph, start, end):
+def find_shortest_path_between_stations(graph: CsrGraph, start, end):
     """
     2駅間の最短パスを見つける
 
     Args:
-        graph: グラフデータ
+        graph: グラフデータ（CSR形式）
         start: 開始駅
         end: 終了駅
 
@@ -62,44 +77,38 @@ def find_shortest_path_between_stations(graph, start, end):
     if start == end:
         return [start]
 
-    queue = deque([(start, [start])])
-    visited = {start}
-
-    while queue:
-        current, path = queue.popleft()
-
-        for edge in graph.get(current, {}).get("edges", []):
-            neighbor = edge["station"]
-            if neighbor == end:
-                return path + [neighbor]
-
-            if neighbor not in visited and neighbor in graph:
-                visited.add(neighbor)
-                queue.append((neighbor, path + [neighbor]))
+    name_to_id = graph.name_to_id
+    if start not in name_to_id or end not in name_to_id:
+        return []  # パスが見つからない場合
 
-    return []  # パスが見つからない場合
+    path = shortest_path(
+        graph.indptr, graph.indices, name_to_id[start], name_to_id[end]
+    )
+    return [graph.names[station_id] for station_id in path]
 
 
-def find_minimal_connected_component(graph, target_stations):
+def find_minimal_connected_component(graph: CsrGraph, target_stations):
     """
-    シュタイナー木の2-近似アルゴリズムを使用して最小連結成分を計算
+    シュタイナー木の2-近似アルゴリズム（Takahashi–Matsuyama法）を使用して最小連結成分を計算
 
     アルゴリズム：
-    1. 全ペア間の最短距離を計算
-    2. 距離重み付き完全グラフを作成
-    3. 最小全域木(MST)を計算
-    4. MSTの各辺に対応する元グラフの最短パスを結合
+    1. 最初の駅だけからなる木から始める
+    2. 木の全駅を始点にBFSし、まだ木に含まれない駅のうち最も近い駅までの最短パスを求める
+    3. そのパス上の駅を木に加える
+    4. 全ての駅が木に含まれるまで2〜3を繰り返す
 
     Args:
-        graph: グラフデータ（駅名をキーとする辞書）
+        graph: グラフデータ（CSR形式）
         target_stations: 含める必要がある駅のリスト
 
     Returns:
         最小連結成分に含まれる駅のセット
     """
+    name_to_id = graph.name_to_id
+
     # target_stationsがグラフに存在するかチェック
     for station in target_stations:
-        if station not in graph:
+        if station not in name_to_id:
             print(f"警告: 駅 '{station}' がグラフに存在しません")
             return set()
 
@@ -112,145 +121,81 @@ def find_minimal_connected_component(graph, target_stations):
         )
         return set(path) if path else set()
 
-    # ステップ1: 全ペア間の最短距離とパスを計算
-    distances = {}
-    paths = {}
-
-    for i, station1 in enumerate(target_stations):
-        for j, station2 in enumerate(target_stations):
-            if i < j:  # 対称なので片方向のみ計算
-                path = find_shortest_path_between_stations(graph, station1, station2)
-                if not path:
-                    print(f"エラー: {station1} と {station2} が接続されていません")
-                    return set()
-
-                distance = len(path) - 1  # エッジ数
-                distances[(station1, station2)] = distance
-                paths[(station1, station2)] = path
-
-    # ステップ2&3: 最小全域木(MST)を計算（Kruskalアルゴリズム）
-    edges = [(dist, s1, s2) for (s1, s2), dist in distances.items()]
-    edges.sort()  # 距離でソート
-
-    # Union-Find データ構造
-    parent = {station: station for station in target_stations}
-
-    def find(x):
-        if parent[x] != x:
-            parent[x] = find(parent[x])
-        return parent[x]
-
-    def union(x, y):
-        px, py = find(x), find(y)
-        if px != py:
-            parent[px] = py
-            return True
-        return False
-
-    mst_edges = []
-    for dist, s1, s2 in edges:
-        if union(s1, s2):
-            mst_edges.append((s1, s2))
-            if len(mst_edges) == len(target_stations) - 1:
-                break
-
-    # ステップ4: MSTの各辺に対応する最短パスを結合
-    result_stations = set()
-
-    for s1, s2 in mst_edges:
-        # 正規化されたキーを使ってパスを取得
-        if (s1, s2) in paths:
-            path = paths[(s1, s2)]
-        else:
-            path = paths[(s2, s1)]
+    # ステップ1: 最初の駅から木を始める
+    first_id = name_to_id[target_stations[0]]
+    tree = [first_id]
+    tree_set = {first_id}
+    remaining = {name_to_id[station] for station in target_stations} - tree_set
+    path_count = 0
+
+    # ステップ2〜4: 木から最も近い駅までの最短パスを順に木へ加える
+    while remaining:
+        path = shortest_path_to_any(graph.indptr, graph.indices, tree, remaining)
+        if not path:
+            unreachable = [graph.names[station_id] for station_id in remaining]
+            print(f"エラー: {unreachable} が {target_stations[0]} と接続されていません")
+            return set()
 
-        result_stations.update(path)
+        for station_id in path:
+            if station_id not in tree_set:
+                tree_set.add(station_id)
+                tree.append(station_id)
+        remaining -= tree_set
+        path_count += 1
 
-    print(f"🔗 MST エッジ数: {len(mst_edges)}")
+    result_stations = {graph.names[station_id] for station_id in tree}
+
+    print(f"🔗 追加パス数: {path_count}")
     print(f"📊 結果ノード数: {len(result_stations)} 駅")
 
     return result_stations
 
 
-def count_connected_components(graph, stations):
-    """
-    指定された駅集合における連結成分の個数を計算
-
-    Args:
-        graph: グラフデータ
-        stations: 調べる駅のリスト
-
-    Returns:
-        連結成分の個数
-    """
-    if not stations:
-        return 0
-
-    station_set = set(stations)
-    visited = set()
-    components = 0
-
-    for station in stations:
-        if station not in visited and station in graph:
-            # 新しい連結成分を発見
-            components += 1
-
-            # BFSでこの連結成分の全ての駅を訪問
-            queue = deque([station])
-            visited.add(station)
-
-            while queue:
-                current = queue.popleft()
-
-                for edge in graph.get(current, {}).get("edges", []):
-                    neighbor = edge["station"]
-                    if neighbor in station_set and neighbor not in visited:
-                        visited.add(neighbor)
-                        queue.append(neighbor)
-
-    return components
-
-
 def select_disconnected_stations(graph, candidates, count):
     """
     候補駅からお互いに接続していない駅を指定数選択
 
     Args:
-        graph: グラフデータ
+        graph: グラフデータ（CSR形式）
         candidates: 候補駅のリスト
         count: 選択する駅数
 
     Returns:
         お互いに接続していない駅のリスト（失敗時はNone）
     """
-    import itertools
+    if len(candidates) < count:
+        return None
+
+    name_to_id = graph.name_to_id
+    names = graph.names
+
+    # 候補駅どうしの隣接関係（候補駅だけの部分グラフ）を先に求めておく
+    candidate_set = set(candidates)
+    candidate_neighbors = {}
+    for station in candidates:
+        neighbors = set()
+        if station in name_to_id:
+            for neighbor in graph.neighbors(name_to_id[station]):
+                if names[neighbor] in candidate_set:
+                    neighbors.add(names[neighbor])
+        candidate_neighbors[station] = neighbors
 
     # 最大試行回数
     max_attempts = 1000
 
     for attempt in range(max_attempts):
-        # ランダムに候補を選択
-        if len(candidates) < count:
-            return None
-
-        selected = random.sample(candidates, count)
-
-        # 選択された駅がお互いに接続していないかチェック
-        all_disconnected = True
-
-        for i, j in itertools.combinations(range(len(selected)), 2):
-            station1, station2 = selected[i], selected[j]
-
-            # station1がstation2に隣接しているかチェック
-            if station1 in graph and station2 in graph:
-                station1_neighbors = {
-                    edge["station"] for edge in graph[station1].get("edges", [])
-                }
-                if station2 in station1_neighbors:
-                    all_disconnected = False
-                    break
-
-        if all_disconnected:
+        # 選んだ駅とその隣接駅を候補から除きながら、1駅ずつランダムに選択
+        selected = []
+        available = candidates
+        while len(selected) < count and available:
+            station = random.choice(available)
+            selected.append(station)
+            excluded = candidate_neighbors[station]
+            available = [
+                other for other in available if other != station and other not in excluded
+            ]
+
+        if len(selected) == count:
             print(f"✅ 非接続な{count}駅を{attempt+1}回目で発見")
             return selected
 
@@ -258,55 +203,48 @@ def select_disconnected_stations(graph, candidates, count):
     return None
 
 
-def is_connected_to_current_stations(graph, target_station, current_stations):
-    """
-    指定された駅が現在の駅集合に接続されているかチェック
-
-    Args:
-        graph: グラフデータ
-        target_station: チェック対象の駅
-        current_stations: 現在の駅集合
-
-    Returns:
-        bool: 接続されている場合True
-    """
-    if target_station not in graph:
-        return False
-
-    current_set = set(current_stations)
-
-    # target_stationの隣接駅をチェック
-    for edge in graph[target_station].get("edges", []):
-        neighbor = edge["station"]
-        if neighbor in current_set:
-            return True
-
-    return False
-
-
 def sort_answer_stations_by_connectivity(graph, start_stations, answer_stations):
     """
     スタート駅+これまで追加した駅に接続されていない駅を優先して前に並べるように正解駅をソート
 
     Args:
-        graph: グラフデータ
+        graph: グラフデータ（CSR形式）
         start_stations: スタート駅のリスト
         answer_stations: 正解駅のリスト
 
     Returns:
         ソートされた正解駅のリスト
     """
+    name_to_id = graph.name_to_id
     remaining_answers = answer_stations.copy()
-    current_stations = start_stations.copy()
     sorted_answers = []
 
+    # 隣接駅ID -> その駅を隣接駅に持つ正解駅 の対応を先に作っておく
+    answers_by_neighbor = {}
+    for station in answer_stations:
+        if station in name_to_id:
+            for neighbor in graph.neighbors(name_to_id[station]):
+                answers_by_neighbor.setdefault(neighbor, []).append(station)
+
+    # 現在の駅集合（スタート駅+これまで追加した駅）に接続されている正解駅
+    connected_answers = set()
+
+    def add_current_station(station):
+        # 駅を現在の駅集合に加え、その駅に隣接する正解駅を接続済みにする
+        station_id = name_to_id.get(station)
+        if station_id is not None:
+            connected_answers.update(answers_by_neighbor.get(station_id, ()))
+
+    for station in start_stations:
+        add_current_station(station)
+
     while remaining_answers:
-        # 現在の駅集合（スタート駅+これまで追加した駅）に接続されていない駅を探す
+        # 現在の駅集合に接続されていない駅を探す
         unconnected = []
         connected = []
 
         for station in remaining_answers:
-            if is_connected_to_current_stations(graph, station, current_stations):
+            if station in connected_answers:
                 connected.append(station)
             else:
                 unconnected.append(station)
@@ -321,7 +259,7 @@ def sort_answer_stations_by_connectivity(graph, start_stations, answer_stations)
 
         # 選択された駅を追加
         sorted_answers.append(next_station)
-        current_stations.append(next_station)
+        add_current_station(next_station)
         remaining_answers.remove(next_station)
 
     return sorted_answers
@@ -332,7 +270,7 @@ def analyze_connectivity_progression(graph, start_stations, sorted_answer_statio
     ソート済み正解駅を順次追加し、最大連結成分数を分析
 
     Args:
-        graph: グラフデータ
+        graph: グラフデータ（CSR形式）
         start_stations: スタート駅のリスト
         sorted_answer_stations: ソート済み正解駅のリスト
 
@@ -340,71 +278,41 @@ def analyze_connectivity_progression(graph, start_stations, sorted_answer_statio
         最大連結成分数、連結成分数の推移リスト
     """
     # 既にソート済みの正解駅を使用
+    name_to_id = graph.name_to_id
+    tracker = ComponentTracker(graph)
+
+    def add_station(station):
+        # グラフにない駅は連結成分に含めない
+        station_id = name_to_id.get(station)
+        if station_id is not None:
+            tracker.add(station_id)
+        return tracker.components
 
     # スタート駅から開始
-    current_stations = start_stations.copy()
+    for station in start_stations:
+        add_station(station)
 
     # 初期連結成分数
-    initial_components = count_connected_components(graph, current_stations)
-    max_components = initial_components
-    component_counts = [initial_components]
+    max_components = tracker.components
+    component_counts = [max_components]
 
     # 正解駅を順次追加して連結成分数を記録
     for answer_station in sorted_answer_stations:
-        current_stations.append(answer_station)
-        components = count_connected_components(graph, current_stations)
+        components = add_station(answer_station)
         component_counts.append(components)
         max_components = max(max_components, components)
 
     return max_components, component_counts
 
 
-def calculate_distances_from_stations(graph, start_stations):
-    """
-    複数のスタート駅からの各駅への最短距離を計算
-
-    Args:
-        graph: グラフデータ
-        start_stations: スタート駅のリスト
-
-    Returns:
-        各駅への最短距離の辞書
-    """
-    distances = {}
-
-    # 複数点BFS
-    queue = deque()
-    visited = set()
-
-    # 全てのスタート駅を初期化
-    for station in start_stations:
-        if station in graph:
-            queue.append((station, 0))
-            distances[station] = 0
-            visited.add(station)
-
-    while queue:
-        current, dist = queue.popleft()
-
-        # 隣接駅を探索
-        for edge in graph.get(current, {}).get("edges", []):
-            neighbor = edge["station"]
-            if neighbor not in visited and neighbor in graph:
-                visited.add(neighbor)
-                distances[neighbor] = dist + 1
-                queue.append((neighbor, dist + 1))
-
-    return distances
-
-
 def generate_dummy_stations(
-    graph_data, start_stations, answer_stations, area_goal_stations, num_dummies=5
+    graph, start_stations, answer_stations, area_goal_stations, num_dummies=5
 ):
     """
     ダミー駅を生成する（同じエリアのgoal駅から、スタート駅・正解駅以外で、それらと隣接していない駅を選択）
 
     Args:
-        graph_data: グラフデータ
+        graph: グラフデータ（CSR形式）
         start_stations: スタート駅のリスト
         answer_stations: 正解駅のリスト
         area_goal_stations: 同じエリアのgoal駅のリスト
@@ -413,29 +321,34 @@ def generate_dummy_stations(
     Returns:
         ダミー駅のリスト
     """
+    name_to_id = graph.name_to_id
     excluded_stations = set(start_stations + answer_stations)
 
-    # スタート駅と正解駅の隣接駅を取得
-    adjacent_stations = set()
-    for station in start_stations + answer_stations:
-        if station in graph_data:
-            for edge in graph_data[station].get("edges", []):
-                adjacent_stations.add(edge["station"])
+    # スタート駅と正解駅の隣接駅を、駅IDごとのフラグで持つ
+    adjacent = bytearray(len(graph.names))
+    for station in excluded_stations:
+        if station in name_to_id:
+            for neighbor in graph.neighbors(name_to_id[station]):
+                adjacent[neighbor] = 1
 
     # ダミー候補を同じエリアのgoal駅から生成（除外駅でも隣接駅でもない駅）
+    # 隣接制限を緩和するときのために、隣接駅だった候補も同じ走査で分けておく
     dummy_candidates = []
+    adjacent_candidates = []
     for station in area_goal_stations:
-        if station not in excluded_stations and station not in adjacent_stations:
+        if station in excluded_stations:
+            continue
+        station_id = name_to_id.get(station)
+        if station_id is not None and adjacent[station_id]:
+            adjacent_candidates.append(station)
+        else:
             dummy_candidates.append(station)
 
     # 十分な候補がない場合は隣接制限を緩和
     if len(dummy_candidates) < num_dummies:
         print(f"⚠️ 非隣接ダミー候補が不足（{len(dummy_candidates)}駅）、隣接制限を緩和")
-        for station in area_goal_stations:
-            if station not in excluded_stations:
-                dummy_candidates.append(station)
         # 重複除去
-        dummy_candidates = list(set(dummy_candidates))
+        dummy_candidates = list(dict.fromkeys(dummy_candidates + adjacent_candidates))
 
     # ランダムに選択
     if len(dummy_candidates) >= num_dummies:
@@ -458,34 +371,23 @@ def create_question_list(sorted_answer_stations, dummy_stations):
     Returns:
         questionのリスト（dictのリスト）
     """
-    questions = []
+    # 正解駅とダミー駅を全て混ぜた並びを、位置のランダムな順列として1回で決める
+    total = len(sorted_answer_stations) + len(dummy_stations)
+    positions = random.sample(range(total), total)
+    answer_count = len(sorted_answer_stations)
+
+    all_stations = [None] * total
+
+    # 正解駅は選ばれた位置に元の順序で配置する
+    for answer_station, position in zip(
+        sorted_answer_stations, sorted(positions[:answer_count])
+    ):
+        all_stations[position] = {"station": answer_station, "is_correct": True}
+
+    # ダミー駅は残りの位置にランダムな順序で配置する
+    for dummy_station, position in zip(dummy_stations, positions[answer_count:]):
+        all_stations[position] = {"station": dummy_station, "is_correct": False}
 
-    # 正解駅とダミー駅を全て混ぜる
-    all_stations = []
-    
-    # 正解駅を追加
-    for answer_station in sorted_answer_stations:
-        all_stations.append({"station": answer_station, "is_correct": True})
-    
-    # ダミー駅を追加
-    for dummy_station in dummy_stations:
-        all_stations.append({"station": dummy_station, "is_correct": False})
-    
-    # 全てをランダムにシャッフル
-    random.shuffle(all_stations)
-    
-    # 正解駅のみを元の順序に並び替える
-    # 1. 正解駅の位置を記録
-    correct_positions = []
-    for i, question in enumerate(all_stations):
-        if question["is_correct"]:
-            correct_positions.append(i)
-    
-    # 2. 正解駅を元の順序で正解駅の位置に配置
-    for i, position in enumerate(correct_positions):
-        if i < len(sorted_answer_stations):
-            all_stations[position] = {"station": sorted_answer_stations[i], "is_correct": True}
-    
     return all_stations
 
 
@@ -502,7 +404,7 @@ def generate_quiz(area_key="central", min_max_components=4, max_retries=10):
         スタート駅のリスト、正解駅のリスト、最大連結成分数のタプル
         失敗時は None, None, None
     """
-    area_data, graph_data = load_data(area_key)
+    area_data, graph = load_data(area_key)
 
     if area_key not in area_data:
         print(f"エラー: エリア '{area_key}' が見つかりません")
@@ -511,7 +413,7 @@ def generate_quiz(area_key="central", min_max_components=4, max_retries=10):
     goal_candidates = area_data[area_key]["goal"]
 
     # 重複を除去
-    unique_goal_candidates = list(set(goal_candidates))
+    unique_goal_candidates = list(dict.fromkeys(goal_candidates))
 
     if len(unique_goal_candidates) < 3:
         print(f"エラー: エリア '{area_key}' のユニークなgoal駅が3駅未満です")
@@ -524,7 +426,7 @@ def generate_quiz(area_key="central", min_max_components=4, max_retries=10):
         print(f"🎯 クイズ生成試行 {attempt + 1}/{max_retries}")
         
         # 3駅を非接続になるようにピック
-        start_stations = select_disconnected_stations(graph_data, unique_goal_candidates, 3)
+        start_stations = select_disconnected_stations(graph, unique_goal_candidates, 3)
 
         if not start_stations:
             print("エラー: 非接続な3駅を見つけることができませんでした")
@@ -538,7 +440,7 @@ def generate_quiz(area_key="central", min_max_components=4, max_retries=10):
         print(f"🚉 スタート駅: {start_stations}")
 
         # 最小連結成分を計算
-        component = find_minimal_connected_component(graph_data, start_stations)
+        component = find_minimal_connected_component(graph, start_stations)
 
         if not component:
             print("エラー: 最小連結成分の計算に失敗しました")
@@ -553,12 +455,12 @@ def generate_quiz(area_key="central", min_max_components=4, max_retries=10):
 
         # 正解駅を正しい順序（未接続優先）で並び替え
         sorted_answer_stations = sort_answer_stations_by_connectivity(
-            graph_data, start_stations, answer_stations
+            graph, start_stations, answer_stations
         )
 
         # 連結成分数の推移を分析（ソート済み順序を使用）
         max_components, component_progression = analyze_connectivity_progression(
-            graph_data, start_stations, sorted_answer_stations
+            graph, start_stations, sorted_answer_stations
         )
 
         print(f"🔗 最大連結成分数: {max_components}")
@@ -569,7 +471,7 @@ def generate_quiz(area_key="central", min_max_components=4, max_retries=10):
             
             # ダミー駅を生成（同じエリアのgoal駅から）
             dummy_stations = generate_dummy_stations(
-                graph_data, start_stations, answer_stations, unique_goal_candidates
+                graph, start_stations, answer_stations, unique_goal_candidates
             )
 
             # questionリストを作成
@@ -585,14 +487,34 @@ def generate_quiz(area_key="central", min_max_components=4, max_retries=10):
 
 
 
-def generate_multiple_quizzes(area_key="central", iterations=10, min_max_components=4):
+def _generate_quiz_with_log(area_key, min_max_components):
+    """
+    クイズを1つ生成する（ワーカープロセスで実行される）
+
+    Args:
+        area_key: area.jsonのキー
+        min_max_components: 最大連結成分数の下限
+
+    Returns:
+        generate_quiz() の結果, 生成中の出力ログ
+    """
+    log = io.StringIO()
+    with redirect_stdout(log):
+        result = generate_quiz(area_key, min_max_components)
+    return result, log.getvalue()
+
+
+def generate_multiple_quizzes(area_key="central", iterations=10, min_max_components=4, max_workers=1):
     """
     複数のクイズを生成してJSON形式で出力
 
+    各クイズの生成は独立しているため、max_workers を指定するとプロセスプールで並列に実行する
+
     Args:
         area_key: area.jsonのキー
         iterations: 生成するクイズの数
         min_max_components: 最大連結成分数の下限
+        max_workers: 並列プロセス数（1 の場合は並列化しない、None の場合はCPUコア数）
 
     Returns:
         クイズのリスト（辞書のリスト）
@@ -603,21 +525,38 @@ def generate_multiple_quizzes(area_key="central", iterations=10, min_max_compone
     print(f"📊 最大連結成分数下限: {min_max_components}")
     print("=" * 50)
 
-    for i in range(iterations):
-        print(f"\n📝 クイズ {i+1}/{iterations}")
-        result = generate_quiz(area_key, min_max_components)
-
-        if result and len(result) == 3:
-            start_stations, questions, max_components = result
-            quiz = {
-                "start_stations": start_stations,
-                "questions": questions,
-                "max_connected_components": max_components,
-            }
-            quizzes.append(quiz)
-            print(f"✅ クイズ {i+1} 生成完了")
-        else:
-            print(f"❌ クイズ {i+1} 生成失敗")
+    with ExitStack() as stack:
+        futures = None
+        if max_workers != 1:
+            # fork元と同じ乱数列にならないよう、ワーカーごとに乱数を初期化し直す
+            executor = stack.enter_context(
+                ProcessPoolExecutor(max_workers=max_workers, initializer=random.seed)
+            )
+            futures = [
+                executor.submit(_generate_quiz_with_log, area_key, min_max_components)
+                for _ in range(iterations)
+            ]
+
+        for i in range(iterations):
+            print(f"\n📝 クイズ {i+1}/{iterations}")
+            if futures is None:
+                result = generate_quiz(area_key, min_max_components)
+            else:
+                # 結果は順番通りに受け取り、ログもまとめて表示する
+                result, log = futures[i].result()
+                print(log, end="")
+
+            if result and len(result) == 3:
+                start_stations, questions, max_components = result
+                quiz = {
+                    "start_stations": start_stations,
+                    "questions": questions,
+                    "max_connected_components": max_components,
+                }
+                quizzes.append(quiz)
+                print(f"✅ クイズ {i+1} 生成完了")
+            else:
+                print(f"❌ クイズ {i+1} 生成失敗")
 
     print(f"\n🎉 {len(quizzes)}/{iterations} 個のクイズを生成しました")
     return quizzes
@@ -642,15 +581,21 @@ def main():
     except ValueError:
         iterations = 10
 
+    # 並列プロセス数を選択
+    workers_input = input("並列プロセス数を入力してください [1]: ").strip()
+    try:
+        max_workers = max(int(workers_input), 1) if workers_input else 1
+    except ValueError:
+        max_workers = 1
+
     # 複数クイズを生成
-    quizzes = generate_multiple_quizzes(area_key, iterations)
+    quizzes = generate_multiple_quizzes(area_key, iterations, max_workers=max_workers)
 
     if quizzes:
         # JSON形式で出力
         output_filename = f"quizzes_{area_key}_{len(quizzes)}.json"
 
-        with open(output_filename, "w", encoding="utf-8") as f:
-            json.dump(quizzes, f, ensure_ascii=False, indent=2)
+        dump_json(quizzes, output_filename)
 
         print(f"\n💾 {output_filename} に保存しました")
         print(f"📊 生成されたクイズ数: {len(quizzes)}")
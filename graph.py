@@ -3,10 +3,19 @@ from collections import defaultdict
 
 import pandas as pd
 
+from json_io import dump_json
+
 # CSVの読み込み
-stations = pd.read_csv("data/v2/station.csv")
-joins = pd.read_csv("data/v2/join.csv")
-lines = pd.read_csv("data/v2/line.csv")
+stations = pd.read_csv(
+    "data/v2/station.csv",
+    usecols=["station_cd", "station_name", "pref_cd", "lon", "lat"],
+    dtype={"station_cd": "int64", "pref_cd": "int16"},
+)
+joins = pd.read_csv(
+    "data/v2/join.csv",
+    usecols=["line_cd", "station_cd1", "station_cd2"],
+    dtype={"line_cd": "int32", "station_cd1": "int64", "station_cd2": "int64"},
+)
 
 config_path = "config/tokyo.json"
 
@@ -27,8 +36,6 @@ filtered_stations = stations[stations["pref_cd"].isin(valid_pref_cds)]
 cd_to_name = filtered_stations.set_index("station_cd")["station_name"].to_dict()
 valid_station_cds = set(cd_to_name.keys())
 
-# 路線コード → 路線名
-line_cd_to_name = lines.set_index("line_cd")["line_name"].to_dict()
 # 駅コード → 緯度経度辞書
 station_pos = filtered_stations.set_index("station_cd")[["lon", "lat"]].to_dict(
     orient="index"
@@ -38,50 +45,54 @@ station_pos = filtered_stations.set_index("station_cd")[["lon", "lat"]].to_dict(
 
 graph = defaultdict(lambda: {"lat": None, "lon": None, "edges": []})
 
-for _, row in joins.iterrows():
-    cd1, cd2, line_cd = row["station_cd1"], row["station_cd2"], row["line_cd"]
-
-    if cd1 in valid_station_cds and cd2 in valid_station_cds:
-        # 使用箇所
-        name1, name2 = cd_to_name[cd1], cd_to_name[cd2]
-        name1 = normalize_name(name1)
-        name2 = normalize_name(name2)
-
-        if str(line_cd) not in major_lines:
-            continue
-
-        line_name = major_lines[str(line_cd)]
-
-        # ここでstation_cdを使ってlat, lonを取得
-        if graph[name1]["lat"] is None or graph[name1]["lon"] is None:
-            pos1 = station_pos.get(cd1)
-            if pos1:
-                graph[name1]["lat"] = pos1["lat"]
-                graph[name1]["lon"] = pos1["lon"]
-
-        if graph[name2]["lat"] is None or graph[name2]["lon"] is None:
-            pos2 = station_pos.get(cd2)
-            if pos2:
-                graph[name2]["lat"] = pos2["lat"]
-                graph[name2]["lon"] = pos2["lon"]
-
-        graph[name1]["edges"].append(
-            {
-                "station": name2,
-                "line": line_name,
-                "station_cd": str(cd2),
-                "line_cd": str(line_cd),
-            }
-        )
-        graph[name2]["edges"].append(
-            {
-                "station": name1,
-                "line": line_name,
-                "station_cd": str(cd1),
-                "line_cd": str(line_cd),
-            }
-        )
+# 対象の駅・路線の接続だけに絞り込み、駅名・路線名は列ごとにまとめて求める
+valid_joins = joins[
+    joins["station_cd1"].isin(valid_station_cds)
+    & joins["station_cd2"].isin(valid_station_cds)
+    & joins["line_cd"].astype(str).isin(major_lines.keys())
+]
+line_cds = valid_joins["line_cd"].astype(str)
+line_names = line_cds.map(major_lines)
+names1 = valid_joins["station_cd1"].map(cd_to_name).map(normalize_name)
+names2 = valid_joins["station_cd2"].map(cd_to_name).map(normalize_name)
+
+for cd1, cd2, name1, name2, line_cd, line_name in zip(
+    valid_joins["station_cd1"],
+    valid_joins["station_cd2"],
+    names1,
+    names2,
+    line_cds,
+    line_names,
+):
+    # ここでstation_cdを使ってlat, lonを取得
+    if graph[name1]["lat"] is None or graph[name1]["lon"] is None:
+        pos1 = station_pos.get(cd1)
+        if pos1:
+            graph[name1]["lat"] = pos1["lat"]
+            graph[name1]["lon"] = pos1["lon"]
+
+    if graph[name2]["lat"] is None or graph[name2]["lon"] is None:
+        pos2 = station_pos.get(cd2)
+        if pos2:
+            graph[name2]["lat"] = pos2["lat"]
+            graph[name2]["lon"] = pos2["lon"]
+
+    graph[name1]["edges"].append(
+        {
+            "station": name2,
+            "line": line_name,
+            "station_cd": str(cd2),
+            "line_cd": line_cd,
+        }
+    )
+    graph[name2]["edges"].append(
+        {
+            "station": name1,
+            "line": line_name,
+            "station_cd": str(cd1),
+            "line_cd": line_cd,
+        }
+    )
 
 # JSON出力
-with open("graph_with_pos.json", "w", encoding="utf-8") as f:
-    json.dump(graph, f, ensure_ascii=False, indent=2)
+dump_json(graph, "graph_with_pos.json")
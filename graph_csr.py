@@ -0,0 +1,419 @@
+"""
+駅グラフ(JSON)を整数IDの隣接配列(CSR形式)に変換するモジュール
+
+BFSなどの探索で駅名の文字列やエッジのdictを辿らずに済むよう、
+駅をIDに置き換えて隣接駅IDを1本の配列に詰めて持つ
+変換結果はキャッシュファイルに保存でき、次回からはJSONを読まずにmmapで読み込める
+"""
+
+import mmap
+import sys
+from array import array
+from pathlib import Path
+from typing import NamedTuple
+
+from json_io import load_json
+
+# キャッシュファイルの拡張子と先頭のマジックナンバー
+CACHE_SUFFIX = ".csr"
+CACHE_MAGIC = b"CSR1"
+
+
+class CsrGraph(NamedTuple):
+    """CSR形式の駅グラフ
+
+    駅ID i の隣接駅IDは indices[indptr[i]:indptr[i + 1]] に並ぶ
+    キャッシュから読み込んだ場合、indptr と indices は mmap 上の memoryview になる
+    lines は build_csr(with_lines=True) のときだけ作られ、indices と同じ並びで路線名を持つ
+    """
+
+    names: list[str]
+    name_to_id: dict[str, int]
+    indptr: array
+    indices: array
+    lines: list[str] | None = None
+
+    def neighbors(self, station_id: int) -> array:
+        """駅IDの隣接駅IDを返す"""
+        return self.indices[self.indptr[station_id] : self.indptr[station_id + 1]]
+
+    def degree(self, station_id: int) -> int:
+        """駅IDの隣接駅の数を返す"""
+        return self.indptr[station_id + 1] - self.indptr[station_id]
+
+
+def build_csr(graph_data: dict, with_lines: bool = False) -> CsrGraph:
+    """
+    グラフデータをCSR形式に変換する
+
+    Args:
+        graph_data: 駅名 -> {"edges": [{"station": ..., "line": ...}, ...]} のグラフデータ
+        with_lines: エッジの路線名も lines に持たせるか
+
+    Returns:
+        CsrGraph（エッジの並び順は元のグラフと同じ）
+    """
+    names = list(graph_data)
+    name_to_id = {name: i for i, name in enumerate(names)}
+
+    # エッジの接続先にしか現れない駅にもIDを振る
+    for node in graph_data.values():
+        for edge in node.get("edges", []):
+            station = edge["station"]
+            if station not in name_to_id:
+                name_to_id[station] = len(names)
+                names.append(station)
+
+    indptr = array("i", [0])
+    indices = array("i")
+    # 同じ路線名は1つの文字列オブジェクトを共有させる
+    lines = [] if with_lines else None
+    for name in names:
+        node = graph_data.get(name)
+        if node is not None:
+            edges = node.get("edges", [])
+            indices.extend(name_to_id[edge["station"]] for edge in edges)
+            if with_lines:
+                lines.extend(sys.intern(edge["line"]) for edge in edges)
+        indptr.append(len(indices))
+
+    return CsrGraph(names, name_to_id, indptr, indices, lines)
+
+
+def save_csr(graph: CsrGraph, path) -> None:
+    """
+    CSR形式のグラフをキャッシュファイルに保存する
+
+    形式: マジックナンバー, 駅数・エッジ数・駅名のバイト数(int32), indptr, indices, 改行区切りの駅名
+    整数はこのマシンのバイト順で書くため、キャッシュは生成したマシンでのみ使うこと
+
+    Args:
+        graph: 保存するグラフ
+        path: 出力先のパス
+    """
+    names_bytes = "\n".join(graph.names).encode("utf-8")
+    header = array("i", [len(graph.names), len(graph.indices), len(names_bytes)])
+
+    with open(path, "wb") as f:
+        f.write(CACHE_MAGIC)
+        f.write(header.tobytes())
+        f.write(array("i", graph.indptr).tobytes())
+        f.write(array("i", graph.indices).tobytes())
+        f.write(names_bytes)
+
+
+def load_csr(path) -> CsrGraph:
+    """
+    キャッシュファイルをmmapして、コピーせずにCSR形式のグラフとして読み込む
+
+    Args:
+        path: キャッシュファイルのパス
+
+    Returns:
+        CsrGraph
+
+    Raises:
+        ValueError: キャッシュファイルの形式が不正な場合
+    """
+    with open(path, "rb") as f:
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    header_end = len(CACHE_MAGIC) + 12
+    if len(view) < header_end or view[: len(CACHE_MAGIC)] != CACHE_MAGIC:
+        raise ValueError(f"CSRキャッシュの形式が不正です: {path}")
+
+    station_count, edge_count, names_size = view[len(CACHE_MAGIC) : header_end].cast("i")
+    indptr_end = header_end + 4 * (station_count + 1)
+    indices_end = indptr_end + 4 * edge_count
+    if len(view) != indices_end + names_size:
+        raise ValueError(f"CSRキャッシュの形式が不正です: {path}")
+
+    indptr = view[header_end:indptr_end].cast("i")
+    indices = view[indptr_end:indices_end].cast("i")
+    names = str(view[indices_end:], "utf-8").split("\n") if station_count else []
+    name_to_id = {name: i for i, name in enumerate(names)}
+
+    return CsrGraph(names, name_to_id, indptr, indices)
+
+
+def load_graph(graph_file) -> CsrGraph:
+    """
+    グラフJSONをCSR形式で読み込む（JSONより新しいキャッシュファイルがあればそちらを使う）
+
+    Args:
+        graph_file: グラフJSONのパス
+
+    Returns:
+        CsrGraph
+
+    Raises:
+        FileNotFoundError: グラフJSONが存在しない場合
+    """
+    graph_path = Path(graph_file)
+    cache_path = graph_path.with_suffix(CACHE_SUFFIX)
+
+    try:
+        if cache_path.stat().st_mtime >= graph_path.stat().st_mtime:
+            return load_csr(cache_path)
+    except (FileNotFoundError, ValueError):
+        pass
+
+    return build_csr(load_json(str(graph_file)))
+
+
+def bfs_distances(
+    indptr: array,
+    indices: array,
+    source: int,
+    targets: frozenset[int] | None = None,
+    max_depth: int | None = None,
+) -> list[int]:
+    """
+    CSR配列上で始点から各駅へのホップ数をBFSで求める
+
+    Args:
+        indptr: CsrGraph.indptr
+        indices: CsrGraph.indices
+        source: 始点の駅ID
+        targets: 距離が必要な駅IDの集合（指定すると全て見つかった時点で探索を打ち切る）
+        max_depth: 探索する最大ホップ数（指定するとそれより遠い駅は探索しない）
+
+    Returns:
+        駅IDごとの距離のリスト（到達できない駅・探索しなかった駅は -1）
+    """
+    dist = [-1] * (len(indptr) - 1)
+    dist[source] = 0
+
+    # 未発見のtargetの数（targets未指定なら0にならないので打ち切らない）
+    if targets is None:
+        targets = frozenset()
+        remaining = -1
+    else:
+        remaining = len(targets) - (source in targets)
+        if remaining == 0:
+            return dist
+
+    # 最短距離は駅数-1を超えないので、未指定なら実質無制限になる
+    if max_depth is None:
+        max_depth = len(indptr)
+
+    frontier = [source]
+    distance = 0
+
+    while frontier and distance < max_depth:
+        distance += 1
+        next_frontier = []
+        next_append = next_frontier.append
+
+        for current in frontier:
+            for next_id in indices[indptr[current] : indptr[current + 1]]:
+                if dist[next_id] < 0:
+                    dist[next_id] = distance
+                    next_append(next_id)
+                    if next_id in targets:
+                        remaining -= 1
+                        if remaining == 0:
+                            return dist
+
+        frontier = next_frontier
+
+    return dist
+
+
+def shortest_path(indptr: array, indices: array, source: int, target: int) -> list[int]:
+    """
+    CSR配列上で2駅間の最短パスをBFSで求める
+
+    Args:
+        indptr: CsrGraph.indptr
+        indices: CsrGraph.indices
+        source: 始点の駅ID
+        target: 終点の駅ID
+
+    Returns:
+        始点から終点までの駅IDのリスト（到達できない場合は空リスト）
+    """
+    if source == target:
+        return [source]
+
+    n = len(indptr) - 1
+    parent = array("i", [-1]) * n
+    parent[source] = source
+
+    # 各駅は1回しかキューに入らないので、駅数分の配列をキューとして使い回す
+    queue = array("i", [0]) * n
+    queue[0] = source
+    head, tail = 0, 1
+
+    while head < tail:
+        current = queue[head]
+        head += 1
+
+        for next_id in indices[indptr[current] : indptr[current + 1]]:
+            if next_id == target:
+                path = [target]
+                while current != source:
+                    path.append(current)
+                    current = parent[current]
+                path.append(source)
+                path.reverse()
+                return path
+
+            if parent[next_id] < 0:
+                parent[next_id] = current
+                queue[tail] = next_id
+                tail += 1
+
+    return []
+
+
+def shortest_path_to_any(
+    indptr: array, indices: array, sources: list[int], targets: set[int]
+) -> list[int]:
+    """
+    CSR配列上で複数の始点からBFSし、最初に見つかったtargetまでの最短パスを求める
+
+    Args:
+        indptr: CsrGraph.indptr
+        indices: CsrGraph.indices
+        sources: 始点の駅IDのリスト（targetを含まないこと）
+        targets: 到達したい駅IDの集合
+
+    Returns:
+        いずれかの始点から最も近いtargetまでの駅IDのリスト（到達できない場合は空リスト）
+    """
+    n = len(indptr) - 1
+    parent = array("i", [-1]) * n
+    queue = array("i", [0]) * n
+    tail = 0
+
+    for source in sources:
+        if parent[source] < 0:
+            parent[source] = source
+            queue[tail] = source
+            tail += 1
+
+    head = 0
+    while head < tail:
+        current = queue[head]
+        head += 1
+
+        for next_id in indices[indptr[current] : indptr[current + 1]]:
+            if parent[next_id] >= 0:
+                continue
+
+            parent[next_id] = current
+            if next_id in targets:
+                path = [next_id]
+                while parent[current] != current:
+                    path.append(current)
+                    current = parent[current]
+                path.append(current)
+                path.reverse()
+                return path
+
+            queue[tail] = next_id
+            tail += 1
+
+    return []
+
+
+def multi_source_distances(
+    indptr: array, indices: array, sources: list[int]
+) -> tuple[list[int], list[int]]:
+    """
+    CSR配列上で複数の始点から各駅へのホップ数をBFSで求める
+
+    Args:
+        indptr: CsrGraph.indptr
+        indices: CsrGraph.indices
+        sources: 始点の駅IDのリスト
+
+    Returns:
+        到達した駅IDの訪問順のリスト, 駅IDごとの距離のリスト（到達できない駅は -1）
+    """
+    dist = [-1] * (len(indptr) - 1)
+    frontier = []
+
+    for source in sources:
+        if dist[source] < 0:
+            dist[source] = 0
+            frontier.append(source)
+
+    # 距離ごとに探索範囲(frontier)を広げる
+    order = list(frontier)
+    distance = 0
+
+    while frontier:
+        distance += 1
+        next_frontier = []
+        next_append = next_frontier.append
+
+        for current in frontier:
+            for next_id in indices[indptr[current] : indptr[current + 1]]:
+                if dist[next_id] < 0:
+                    dist[next_id] = distance
+                    next_append(next_id)
+
+        order.extend(next_frontier)
+        frontier = next_frontier
+
+    return order, dist
+
+
+class ComponentTracker:
+    """
+    駅を1つずつ追加しながら、追加済みの駅だけからなる部分グラフの連結成分数を数える
+
+    追加した駅を既に追加済みの隣接駅とUnion-Findで併合するので、
+    1駅の追加は隣接駅の数に比例する手間で済む
+    """
+
+    def __init__(self, graph: CsrGraph):
+        """
+        Args:
+            graph: CSR形式の駅グラフ
+        """
+        self._indptr = graph.indptr
+        self._indices = graph.indices
+        # 駅IDごとのUnion-Findの親（-1: 未追加）
+        self._parent = array("i", [-1]) * (len(graph.indptr) - 1)
+        self.components = 0
+
+    def _find(self, x: int) -> int:
+        parent = self._parent
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def add(self, station_id: int) -> int:
+        """
+        駅を追加し、追加後の連結成分数を返す（追加済みの駅なら何もしない）
+
+        Args:
+            station_id: 追加する駅ID
+
+        Returns:
+            連結成分の個数
+        """
+        parent = self._parent
+        if parent[station_id] >= 0:
+            return self.components
+
+        # 追加した駅を根にして、隣接する既存の連結成分をその下に付け替える
+        parent[station_id] = station_id
+        components = self.components + 1
+        indptr = self._indptr
+        for neighbor in self._indices[indptr[station_id] : indptr[station_id + 1]]:
+            if parent[neighbor] < 0:
+                continue
+            root = self._find(neighbor)
+            if root != station_id:
+                parent[root] = station_id
+                components -= 1
+
+        self.components = components
+        return components
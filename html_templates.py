@@ -0,0 +1,242 @@
+"""
+main.py で表示するHTML/CSSのテンプレート
+
+Streamlitは操作のたびに main.py 全体を実行し直すが、importしたモジュールは
+読み込み済みのものが使い回されるため、固定の文字列はここで1回だけ組み立てる
+"""
+
+from functools import lru_cache
+
+HEADER_HTML = """
+        <div style="width: 100%; display: flex; justify-content: center;">
+            <h1 style="
+                background: linear-gradient(to right, #42a5f5, #1e88e5);
+                -webkit-background-clip: text;
+                -webkit-text-fill-color: transparent;
+                font-size: 2.4rem;
+                font-weight: 900;
+                font-family: 'Segoe UI', 'Helvetica Neue', sans-serif;
+                text-shadow: 2px 2px 4px rgba(0,0,0,0.1);
+                letter-spacing: 0.05em;
+                margin-top: 0.8rem;
+                margin-bottom: 0.3rem;
+                text-align: center;
+            ">
+                🚃 駅つなぎ 🚃
+            </h1>
+        </div>
+        """
+
+RESULT_HEADER_HTML = """
+    <div style="
+        width: 100%;
+        display: flex;
+        justify-content: center;
+        margin: 0.3rem 0 0.8rem 0;
+    ">
+        <h2 style="
+            font-size: 1.6rem;
+            font-weight: 700;
+            font-family: 'Segoe UI', 'Helvetica Neue', sans-serif;
+            color: #1e88e5;
+            margin: 0;
+        ">
+            <span style="filter: brightness(0) saturate(100%) invert(30%) sepia(100%) saturate(2000%) hue-rotate(180deg);">🎉</span>
+            結果発表
+            <span style="filter: brightness(0) saturate(100%) invert(30%) sepia(100%) saturate(2000%) hue-rotate(180deg);">🎉</span>
+        </h2>
+    </div>
+    """
+
+PATH_STYLE = """
+        <style>
+        .station {
+            font-weight: bold;
+            font-size: 18px;
+            color: #2c3e50;
+            margin-bottom: 4px;
+        }
+        .line-row {
+            display: flex;
+            align-items: center;
+            font-size: 14px;
+            color: #16a085;
+            margin: 4px 0 8px 10px;
+        }
+        .arrow {
+            margin-right: 4px;
+            color: #7f8c8d;
+            font-size: 16px;
+        }
+        </style>
+        """
+
+# {line} に路線名が入る
+PATH_LINE_ROW_TEMPLATE = """
+                    <div class="line-row">
+                        <div class="arrow">⬇</div>
+                        <div class="line">{line}</div>
+                    </div>
+                """
+
+# {goal}, {life}, {hint} に目的地・残ライフ・残ヒントの表示が入る
+GAME_STATUS_TEMPLATE = """
+        <div style="
+            background-color: #e3f2fd;
+            padding: 1rem;
+            border-radius: 10px;
+            box-shadow: 1px 1px 6px rgba(0,0,0,0.08);
+            display: flex;
+            justify-content: space-between;
+            flex-wrap: nowrap;
+            text-align: center;
+        ">
+            <div style="flex: 1; min-width: 100px;">
+                <div style="font-size: 0.8rem; color: #1565c0;">目的地</div>
+                <div style="font-size: 1.2rem; font-weight: bold; margin-top: 0.3rem;">{goal}</div>
+            </div>
+            <div style="flex: 1; min-width: 100px;">
+                <div style="font-size: 0.8rem; color: #1565c0;">残ライフ</div>
+                <div style="font-size: 1.2rem; font-weight: bold; margin-top: 0.3rem;">{life}</div>
+            </div>
+            <div style="flex: 1; min-width: 100px;">
+                <div style="font-size: 0.8rem; color: #1565c0;">残ヒント</div>
+                <div style="font-size: 1.2rem; font-weight: bold; margin-top: 0.3rem;">{hint}</div>
+            </div>
+        </div>
+        <br>
+        """
+
+# ライフ・ヒントの残数ごとの表示
+HEARTS = tuple("🩷" * n for n in range(4))
+BULBS = tuple("💡" * n for n in range(3))
+
+VISITED_TAGS_OPEN = """
+<div style="display: flex; flex-wrap: wrap; gap: 0.5rem; margin-top: 0.5rem;">
+"""
+
+# {station} に駅名が入る
+VISITED_TAG_TEMPLATE = """
+<div style="
+    background-color: #e0f2f1;
+    color: #004d40;
+    padding: 0.4rem 0.8rem;
+    border-radius: 20px;
+    font-size: 0.9rem;
+    box-shadow: 1px 1px 4px rgba(0,0,0,0.1);
+">{station}</div>
+"""
+
+# {round_num}, {goal}, {score_display}, {score_width} にラウンドごとの結果が入る
+ROUND_SCORE_TEMPLATE = """
+<div style="
+    border: 1px solid #ddd;
+    border-radius: 8px;
+    padding: 0.5rem 0.75rem;
+    margin-bottom: 0.4rem;
+    background-color: #f9f9f9;
+    box-shadow: 1px 1px 4px rgba(0,0,0,0.03);
+    font-size: 0.9rem;
+    line-height: 1.3;
+">
+    <div style="display: flex; align-items: center; gap: 1rem;">
+        <div style="font-weight: bold;">ラウンド {round_num}</div>
+        <div style="color: #1565c0;">目的地: <b>{goal}</b></div>
+    </div>
+    <div style="display: flex; align-items: center; justify-content: space-between; margin-top: 0.4rem;">
+        <div>スコア: <b>{score_display}</b></div>
+        <div style="flex-grow: 1; margin-left: 1rem; background: #eee; border-radius: 4px; overflow: hidden;">
+            <div style="
+                height: 8px;
+                width: {score_width}%;
+                background-color: #4db6ac;
+            "></div>
+        </div>
+    </div>
+</div>
+"""
+
+# {area} にエリア名が入る
+AREA_STATUS_TEMPLATE = """
+        <div style="
+            background-color: #fff3e0;
+            padding: 1rem;
+            border-radius: 10px;
+            text-align: center;
+            font-size: 1.2rem;
+            font-weight: bold;
+            color: #e65100;
+            margin-bottom: 1.5rem;
+            box-shadow: 1px 1px 4px rgba(0,0,0,0.1);
+        ">
+            エリア：{area}
+        </div>
+    """
+
+# {title}, {score_color}, {total}, {max_score}, {comment}, {share_url} に結果が入る
+SHARE_RESULT_TEMPLATE = """
+        <div style="
+            background-color: #e0f7fa;
+            padding: 1.2rem 1.5rem;
+            border-radius: 10px;
+            margin-bottom: 2rem;
+            box-shadow: 0 2px 8px rgba(0, 0, 0, 0.1);
+            text-align: center;
+        ">
+            <div style="font-size: 1.2rem; color: #00796b; margin-bottom: 0.5rem; font-weight: 600;">
+                {title}
+            </div>
+            <div style="
+                font-size: 2.5rem;
+                font-weight: bold;
+                color: {score_color};
+                line-height: 1;
+                white-space: nowrap;
+                margin-bottom: 0.5rem;
+            ">
+                {total} <span style="font-size: 1rem; color: #555;">/ {max_score} 点</span>
+            </div>
+            <div style="font-size: 1rem; color: #444; margin-bottom: 1rem;">
+                {comment}
+            </div>
+            <a href="{share_url}" target="_blank" style="text-decoration:none;">
+                <button style="
+                    background-color:#000000;
+                    color:white;
+                    border:none;
+                    padding:0.5rem 1rem;
+                    border-radius:5px;
+                    cursor:pointer;
+                ">
+                    Xでシェアする
+                </button>
+            </a>
+        </div>
+        """
+
+
+@lru_cache(maxsize=256)
+def game_status_html(goal: str, life: int, hint: int) -> str:
+    """目的地・残ライフ・残ヒントの表示のHTMLを返す（同じ状態なら作り直さない）."""
+    return GAME_STATUS_TEMPLATE.format(goal=goal, life=HEARTS[life], hint=BULBS[hint])
+
+
+@lru_cache(maxsize=None)
+def area_status_html(area: str) -> str:
+    """エリア表示のHTMLを返す."""
+    return AREA_STATUS_TEMPLATE.format(area=area)
+
+
+@lru_cache(maxsize=64)
+def share_result_html(
+    title: str, total: int, max_score: int, comment: str, score_color: str, share_url: str
+) -> str:
+    """最終結果とシェアボタンのHTMLを返す."""
+    return SHARE_RESULT_TEMPLATE.format(
+        title=title,
+        score_color=score_color,
+        total=total,
+        max_score=max_score,
+        comment=comment,
+        share_url=share_url,
+    )
@@ -0,0 +1,161 @@
+"""
+JSONファイルの読み書きをまとめたモジュール
+"""
+
+import mmap
+import os
+import pickle
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+import orjson
+
+SNAPSHOT_SUFFIX = ".pkl"
+
+
+@lru_cache(maxsize=None)
+def load_json(path: str):
+    """
+    JSONファイルを読み込む（同じパスは2回目以降キャッシュを返す）
+
+    ファイルはmmapして、read()でバッファへコピーせずにそのままパーサーへ渡す
+    返り値は呼び出し元の間で共有されるため、変更しないこと
+
+    Args:
+        path: JSONファイルのパス
+
+    Returns:
+        読み込んだデータ
+    """
+    with open(path, "rb") as f:
+        # 空ファイルはmmapできないので、そのままパーサーにエラーを出させる
+        if os.fstat(f.fileno()).st_size == 0:
+            return orjson.loads(b"")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+def load_json_snapshot(path):
+    """
+    JSONファイルを読み込み、パース結果をpickleのスナップショットとして残す
+
+    JSONと同じ場所にあるスナップショットがJSONより新しければ、
+    JSONをパースせずにスナップショットを読み込む
+    スナップショットを書き込めない環境では、JSONの読み込み結果だけを返す
+
+    Args:
+        path: JSONファイルのパス
+
+    Returns:
+        読み込んだデータ
+    """
+    json_path = Path(path)
+    snapshot_path = json_path.with_suffix(SNAPSHOT_SUFFIX)
+
+    try:
+        if snapshot_path.stat().st_mtime >= json_path.stat().st_mtime:
+            with open(snapshot_path, "rb") as f:
+                return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+
+    with open(json_path, "rb") as f:
+        data = orjson.loads(f.read())
+
+    # 他のセッションが書きかけのスナップショットを読まないよう、
+    # 同じディレクトリの一時ファイルに書き込んでから置き換える
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=snapshot_path.parent, suffix=SNAPSHOT_SUFFIX, delete=False
+        ) as f:
+            temp_path = f.name
+            pickle.dump(data, f, protocol=5)
+        os.replace(temp_path, snapshot_path)
+    except OSError:
+        if temp_path is not None:
+            Path(temp_path).unlink(missing_ok=True)
+
+    return data
+
+
+def dumps_json(obj) -> bytes:
+    """
+    インデント付きJSONのバイト列(UTF-8)に変換する
+
+    json.dump(obj, f, ensure_ascii=False, indent=2) と同じ内容を出力する
+
+    Args:
+        obj: 変換するデータ
+
+    Returns:
+        JSONのバイト列
+    """
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+
+def dump_json(obj, path) -> None:
+    """
+    データをインデント付きJSONとしてファイルに書き込む
+
+    Args:
+        obj: 書き込むデータ
+        path: 出力先のパス
+    """
+    Path(path).write_bytes(dumps_json(obj))
+
+
+class BackgroundWriter:
+    """
+    ファイル書き込みをスレッドプールに投げ、呼び出し元の処理と並行して行う
+
+    with ブロックを抜けるときに全ての書き込みの完了を待ち、
+    wait() で結果を受け取っていない書き込みが失敗していれば、その例外をそのまま送出する
+    """
+
+    def __init__(self, max_workers=2):
+        """
+        Args:
+            max_workers: 書き込みに使うスレッド数
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = []
+
+    def submit(self, path, payload: bytes) -> Future:
+        """
+        ファイルの書き込みを開始する（完了は待たない）
+
+        Args:
+            path: 出力先のパス
+            payload: 書き込むバイト列
+
+        Returns:
+            書き込みのFuture（wait() に渡すと完了を待てる）
+        """
+        future = self._executor.submit(Path(path).write_bytes, payload)
+        self._futures.append(future)
+        return future
+
+    def wait(self, future: Future) -> None:
+        """
+        書き込みの完了を待ち、失敗していればその例外を送出する
+
+        ここで結果を受け取った書き込みは、with ブロックを抜けるときには例外を再送出しない
+
+        Args:
+            future: submit() が返したFuture
+        """
+        self._futures.remove(future)
+        future.result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._executor.shutdown(wait=True)
+        if exc_type is None:
+            for future in self._futures:
+                future.result()
@@ -1,11 +1,22 @@
-import json
 import random
-import textwrap
 import urllib.parse
 
 import streamlit as st
-import streamlit.components.v1 as components
 
+from graph_csr import CsrGraph, build_csr
+from html_templates import (
+    HEADER_HTML,
+    PATH_LINE_ROW_TEMPLATE,
+    PATH_STYLE,
+    RESULT_HEADER_HTML,
+    ROUND_SCORE_TEMPLATE,
+    VISITED_TAG_TEMPLATE,
+    VISITED_TAGS_OPEN,
+    area_status_html,
+    game_status_html,
+    share_result_html,
+)
+from json_io import load_json_snapshot
 from utils import (
     Edge,
     add_candidates,
@@ -14,6 +25,7 @@ from utils import (
     calculate_score_on_failure,
     choose_goal,
     create_text_for_x,
+    find_distances_from,
     find_shortest_path,
     get_result_comment,
     get_result_title,
@@ -26,28 +38,8 @@ st.set_page_config(
 
 
 def draw_header():
-    components.html(
-        """
-        <div style="width: 100%; display: flex; justify-content: center;">
-            <h1 style="
-                background: linear-gradient(to right, #42a5f5, #1e88e5);
-                -webkit-background-clip: text;
-                -webkit-text-fill-color: transparent;
-                font-size: 2.4rem;
-                font-weight: 900;
-                font-family: 'Segoe UI', 'Helvetica Neue', sans-serif;
-                text-shadow: 2px 2px 4px rgba(0,0,0,0.1);
-                letter-spacing: 0.05em;
-                margin-top: 0.8rem;
-                margin-bottom: 0.3rem;
-                text-align: center;
-            ">
-                🚃 駅つなぎ 🚃
-            </h1>
-        </div>
-        """,
-        height=70,
-    )
+    # iframeを作らないよう、components.html ではなく st.markdown で描画する
+    st.markdown(HEADER_HTML, unsafe_allow_html=True)
 
 
 def share_to_x(text: str, url: str | None = None):
@@ -67,26 +59,64 @@ def share_to_x(text: str, url: str | None = None):
 draw_header()
 
 
-@st.cache_data
-def load_graph():
-    with open("graph.json", encoding="utf-8") as f:
-        return json.load(f)
+@st.cache_resource
+def load_graph() -> CsrGraph:
+    """グラフを駅ID・隣接駅IDの配列(CSR形式)と路線名の配列にして読み込む.
 
+    全セッションでコピーせずに共有するので、変更しないこと.
+    """
+    graph_json = load_json_snapshot("graph.json")
+    return build_csr(
+        {station: {"edges": edges} for station, edges in graph_json.items()},
+        with_lines=True,
+    )
 
-@st.cache_data
+
+@st.cache_resource
 def load_area():
-    with open("area.json", encoding="utf-8") as f:
-        return json.load(f)
+    """エリア定義を読み込む. 全セッションで共有するので、変更しないこと."""
+    return load_json_snapshot("area.json")
+
+
+@st.cache_resource
+def load_area_candidates() -> tuple[dict[str, tuple[str, ...]], dict[str, frozenset[str]]]:
+    """エリアごとのスタート駅・目的地の候補をまとめる（全域は全エリアの和集合）.
+
+    再実行のたびに作り直さないようプロセス内で共有するので、変更しないこと.
+    """
+    area_data = load_area()
+    starts = {area: tuple(values["start"]) for area, values in area_data.items()}
+    goals = {area: frozenset(values["goal"]) for area, values in area_data.items()}
+    # 重複を取り除きつつ、エリアの順番は保つ
+    starts["全域"] = tuple(
+        dict.fromkeys(station for values in area_data.values() for station in values["start"])
+    )
+    goals["全域"] = frozenset(
+        station for values in area_data.values() for station in values["goal"]
+    )
+    return starts, goals
 
 
 graph_data = load_graph()
-area_data = load_area()
+AREA_STARTS, AREA_GOALS = load_area_candidates()
 MAX_ROUNDS = 5
 CHOICE_NUM = 3
 MAX_LIFE = 3
 MAX_HINT = 2
 
 
+@st.cache_data(show_spinner=False, max_entries=256, ttl=3600)
+def cached_shortest_path(
+    goal: str, visited_key: tuple[str, ...]
+) -> list[tuple[str, str | None]] | None:
+    """(目的地, 訪問済みの駅)ごとに最短経路の探索結果をキャッシュする.
+
+    visited_key は訪問済みの駅をソートしたタプル. graph_data は固定なのでキーに含めない.
+    キーの組み合わせは際限なく増えるので、件数と保持期間に上限を設ける.
+    """
+    return find_shortest_path(graph_data, goal, set(visited_key))
+
+
 def display_matched_edge(matched: list[Edge]) -> None:
     """入力した駅に到達する路線を表示する"""
     edges = "<br>".join(
@@ -110,42 +140,54 @@ def display_path_with_lines(path: list[tuple[str, str | None]], title: str) -> N
     """経路を路線名も合わせて表示する（折りたたみ付き）."""
     expanded = len(path) - 1 <= 5
     with st.expander(f"📍 {title}", expanded=expanded):
-        style = """
-        <style>
-        .station {
-            font-weight: bold;
-            font-size: 18px;
-            color: #2c3e50;
-            margin-bottom: 4px;
-        }
-        .line-row {
-            display: flex;
-            align-items: center;
-            font-size: 14px;
-            color: #16a085;
-            margin: 4px 0 8px 10px;
-        }
-        .arrow {
-            margin-right: 4px;
-            color: #7f8c8d;
-            font-size: 16px;
-        }
-        </style>
-        """
-        html = [style, "<div>"]
+        html = [PATH_STYLE, "<div>"]
         for i, (station, line) in enumerate(path):
             html.append(f'<div class="station">{station}</div>')
             if i < len(path) - 1 and line:
-                html.append(f"""
-                    <div class="line-row">
-                        <div class="arrow">⬇</div>
-                        <div class="line">{line}</div>
-                    </div>
-                """)
+                html.append(PATH_LINE_ROW_TEMPLATE.format(line=line))
         html.append("</div>")
         st.markdown("".join(html), unsafe_allow_html=True)
 
 
+def round_score_card(i: int, score: int | None) -> str:
+    """i番目(0始まり)のラウンドの結果カードのHTMLを作る. score が None なら未プレイ扱い."""
+    goal = (
+        st.session_state.goals[i]
+        if "goals" in st.session_state and i < len(st.session_state.goals)
+        else "？"
+    )
+    if score is None:
+        return ROUND_SCORE_TEMPLATE.format(
+            round_num=i + 1, goal=goal, score_display="－ / 20点", score_width=0
+        )
+    return ROUND_SCORE_TEMPLATE.format(
+        round_num=i + 1,
+        goal=goal,
+        score_display=f"{score} / 20点",
+        score_width=score / 20 * 100,
+    )
+
+
+def record_score(score: int) -> None:
+    """ラウンドのスコアを記録し、結果画面用のカードもこの時点で作っておく."""
+    st.session_state.scores.append(score)
+    st.session_state.score_cards.append(
+        round_score_card(len(st.session_state.scores) - 1, score)
+    )
+
+
+def draw_round_result_footer():
+    """ラウンド結果画面(成功・失敗共通)の最短経路の例と、次に進むボタンを表示する."""
+    display_path_with_lines(
+        st.session_state.shortest_path,
+        title=f"最短経路の例 ({len(st.session_state.shortest_path)-1}駅)",
+    )
+    if st.session_state.round == MAX_ROUNDS:
+        st.button("最終結果画面へ進む", on_click=handle_go_result)
+    else:
+        st.button("次のラウンドへ進む", on_click=handle_next_round)
+
+
 def draw_round_result_success_page():
     with main:
         shortest_steps = len(st.session_state.shortest_path) - 1
@@ -162,40 +204,23 @@ def draw_round_result_success_page():
             f"""🎉 **ラウンド{st.session_state.round} クリア！**  
         {explanation}"""
         )
-        st.session_state.scores.append(score)
+        record_score(score)
 
-        display_path_with_lines(
-            st.session_state.shortest_path,
-            title=f"最短経路の例 ({len(st.session_state.shortest_path)-1}駅)",
-        )
-        # TODO:共通処理まとめる
-        if st.session_state.round == MAX_ROUNDS:
-            st.button("最終結果画面へ進む", on_click=handle_go_result)
-        else:
-            st.button("次のラウンドへ進む", on_click=handle_next_round)
+        draw_round_result_footer()
 
 
 def draw_round_result_fail_page():
     score, progress_steps = calculate_score_on_failure(
-        graph_data=graph_data,
-        goal=st.session_state.goal,
-        visited=st.session_state.visited,
-        shortest_path=st.session_state.shortest_path,
+        goal_dist=st.session_state.goal_dist,
+        visited=st.session_state.visited_set,
+        initial_min_dist=st.session_state.initial_min_dist,
     )
     st.error(
         f"到達できませんでした...  \n{progress_steps}駅分だけ近づきました -> **{score}/20 点**"
     )
-    st.session_state.scores.append(score)
+    record_score(score)
 
-    display_path_with_lines(
-        st.session_state.shortest_path,
-        title=f"最短経路の例 ({len(st.session_state.shortest_path)-1}駅)",
-    )
-    # TODO:共通処理まとめる
-    if st.session_state.round == MAX_ROUNDS:
-        st.button("最終結果画面へ進む", on_click=handle_go_result)
-    else:
-        st.button("次のラウンドへ進む", on_click=handle_next_round)
+    draw_round_result_footer()
 
 
 def handle_go_result():
@@ -217,28 +242,29 @@ def handle_move():
     next_station = st.session_state.next_station
     st.session_state.next_station = ""
 
-    if next_station in st.session_state.visited:
+    if next_station in st.session_state.visited_set:
         st.session_state.log_status = "visited"
         return
-    elif next_station not in graph_data:
+    elif next_station not in graph_data.name_to_id:
         st.session_state.log_status = "not_exist"
         return
     else:
-        matched = [
-            c for c in st.session_state.candidates if c.to_station == next_station
-        ]
+        # 隣接していれば候補から取り出す（一致判定と候補の削除を1回で行う）
+        matched = st.session_state.candidates.pop(next_station, None)
         if matched:
             st.session_state.log_status = "success"
             st.session_state.arrived_station = next_station
             st.session_state.matched_edges = matched
 
             st.session_state.visited.append(next_station)
+            st.session_state.visited_set.add(next_station)
+            st.session_state.pop("visited_tags_html", None)
             st.session_state.round_visited.append(next_station)
             st.session_state.candidates = add_candidates(
                 st.session_state.candidates,
-                next_station,
+                (next_station,),
                 graph_data,
-                st.session_state.visited,
+                st.session_state.visited_set,
             )
 
         else:
@@ -248,7 +274,7 @@ def handle_move():
     if st.session_state.life <= 0:
         change_page("round_result_fail")
 
-    elif st.session_state.goal in st.session_state.visited:
+    elif st.session_state.goal in st.session_state.visited_set:
         change_page("round_result_success")
 
 
@@ -287,25 +313,20 @@ def draw_area_select_page():
 
 
 def start_game():
-    if st.session_state.area == "全域":
-        start_candidates = []
-        for area in area_data.values():
-            start_candidates += area["start"]
-        # 重複を取り除く. あとで綺麗に描き直す
-        start_candidates = list(set(start_candidates))
-    else:
-        start_candidates = area_data[st.session_state.area]["start"]
+    start_candidates = AREA_STARTS[st.session_state.area]
 
+    # 表示用に訪問順のリストを、所属判定用に集合を持つ
     st.session_state.visited = random.sample(start_candidates, 3)
-    st.session_state.candidates = []
-    for start_station in st.session_state.visited:
-        st.session_state.candidates = add_candidates(
-            st.session_state.candidates,
-            start_station,
-            graph_data,
-            st.session_state.visited,
-        )
+    st.session_state.visited_set = set(st.session_state.visited)
+    st.session_state.pop("visited_tags_html", None)
+    st.session_state.candidates = add_candidates(
+        {},
+        st.session_state.visited,
+        graph_data,
+        st.session_state.visited_set,
+    )
     st.session_state.scores = []
+    st.session_state.score_cards = []
     st.session_state.goals = []
     st.session_state.round_visited = []
     st.session_state.round = 0
@@ -319,49 +340,65 @@ def start_round():
     st.session_state.hint = MAX_HINT
     st.session_state.log_status = ""
 
-    if st.session_state.area == "全域":
-        goal_candidates = []
-        for area in area_data.values():
-            goal_candidates += area["goal"]
-    else:
-        goal_candidates = area_data[st.session_state.area]["goal"]
-
-    goal = choose_goal(st.session_state.visited, set(goal_candidates))
+    goal = choose_goal(st.session_state.visited_set, AREA_GOALS[st.session_state.area])
     st.session_state.goal = goal
     st.session_state.goals.append(goal)
 
-    st.session_state.shortest_path = find_shortest_path(
-        graph_data,
-        goal,
-        st.session_state.visited,
+    st.session_state.shortest_path = cached_shortest_path(
+        goal, tuple(sorted(st.session_state.visited_set))
     )
+    # 失敗時の部分点計算用に、目的地からの距離をラウンド開始時に1回だけ求めておく
+    st.session_state.goal_dist = find_distances_from(graph_data, goal)
+    st.session_state.initial_min_dist = len(st.session_state.shortest_path) - 1
+
+
+# 1ゲーム分の状態. エリア選択に戻ったときに破棄する
+GAME_STATE_KEYS = (
+    "visited",
+    "visited_set",
+    "visited_tags_html",
+    "candidates",
+    "scores",
+    "score_cards",
+    "goals",
+    "goal",
+    "goal_dist",
+    "shortest_path",
+    "initial_min_dist",
+    "matched_edges",
+    "arrived_station",
+    "round_visited",
+)
+
+
+def reset_game_state():
+    """ゲームを抜けたセッションが前のゲームの状態を持ち続けないよう破棄する."""
+    for key in GAME_STATE_KEYS:
+        st.session_state.pop(key, None)
 
 
 def change_page(new_page: str):
-    st.session_state.page = new_page
+    # 同じページへの切り替えでは session_state を書き換えない
+    if st.session_state.get("page") != new_page:
+        st.session_state.page = new_page
 
 
 def display_visited_stations():
     if "visited" in st.session_state and st.session_state.visited:
         st.markdown("### 🛤️ 訪問済みの駅")
 
-        tags_html = textwrap.dedent("""
-            <div style="display: flex; flex-wrap: wrap; gap: 0.5rem; margin-top: 0.5rem;">
-        """)
-        for station in st.session_state.visited:
-            tags_html += textwrap.dedent(f"""
-                <div style="
-                    background-color: #e0f2f1;
-                    color: #004d40;
-                    padding: 0.4rem 0.8rem;
-                    border-radius: 20px;
-                    font-size: 0.9rem;
-                    box-shadow: 1px 1px 4px rgba(0,0,0,0.1);
-                ">{station}</div>
-            """)
-        tags_html += "</div>"
-
-        st.markdown(tags_html, unsafe_allow_html=True)
+        # 訪問済みの駅が変わったとき(start_game / handle_move で破棄される)だけ組み立て直す.
+        # Streamlitは再実行で描画されなかった要素を消すので、描画自体は毎回行う
+        if "visited_tags_html" not in st.session_state:
+            parts = [VISITED_TAGS_OPEN]
+            parts.extend(
+                VISITED_TAG_TEMPLATE.format(station=station)
+                for station in st.session_state.visited
+            )
+            parts.append("</div>")
+            st.session_state.visited_tags_html = "".join(parts)
+
+        st.markdown(st.session_state.visited_tags_html, unsafe_allow_html=True)
         # 余白を追加
         st.markdown("<br>", unsafe_allow_html=True)  # 空白を追加
 
@@ -370,21 +407,7 @@ def draw_area_status():
     area = st.session_state["area"]
     # エリア表示
     st.markdown(
-        f"""
-        <div style="
-            background-color: #fff3e0;
-            padding: 1rem;
-            border-radius: 10px;
-            text-align: center;
-            font-size: 1.2rem;
-            font-weight: bold;
-            color: #e65100;
-            margin-bottom: 1.5rem;
-            box-shadow: 1px 1px 4px rgba(0,0,0,0.1);
-        ">
-            エリア：{area}
-        </div>
-    """,
+        area_status_html(area),
         unsafe_allow_html=True,
     )
 
@@ -398,32 +421,7 @@ def draw_game_status():
     st.markdown(f"### 🏁 ラウンド {round_num}/{MAX_ROUNDS}")
 
     st.markdown(
-        f"""
-        <div style="
-            background-color: #e3f2fd;
-            padding: 1rem;
-            border-radius: 10px;
-            box-shadow: 1px 1px 6px rgba(0,0,0,0.08);
-            display: flex;
-            justify-content: space-between;
-            flex-wrap: nowrap;
-            text-align: center;
-        ">
-            <div style="flex: 1; min-width: 100px;">
-                <div style="font-size: 0.8rem; color: #1565c0;">目的地</div>
-                <div style="font-size: 1.2rem; font-weight: bold; margin-top: 0.3rem;">{goal}</div>
-            </div>
-            <div style="flex: 1; min-width: 100px;">
-                <div style="font-size: 0.8rem; color: #1565c0;">残ライフ</div>
-                <div style="font-size: 1.2rem; font-weight: bold; margin-top: 0.3rem;">{'🩷' * life}</div>
-            </div>
-            <div style="flex: 1; min-width: 100px;">
-                <div style="font-size: 0.8rem; color: #1565c0;">残ヒント</div>
-                <div style="font-size: 1.2rem; font-weight: bold; margin-top: 0.3rem;">{'💡' * hint}</div>
-            </div>
-        </div>
-        <br>
-        """,
+        game_status_html(goal, life, hint),
         unsafe_allow_html=True,
     )
 
@@ -448,9 +446,8 @@ def draw_instruction():
 @st.dialog("💡ヒントから選ぶ")
 def show_hint_modal():
     hints = calculate_hints(
-        graph=graph_data,
-        goal=st.session_state.goal,
-        candidates=list(set([edge.to_station for edge in st.session_state.candidates])),
+        goal_dist=st.session_state.goal_dist,
+        candidates=list(st.session_state.candidates),
         choices_num=CHOICE_NUM,
     )
 
@@ -499,6 +496,20 @@ def draw_round_play_page():
     )
 
 
+@st.fragment
+def draw_round_play_fragment():
+    """プレイ画面とサイドバー. 駅の入力やヒントの操作ではこの部分だけを再実行する."""
+    main, side = st.columns([5, 4])
+    with main:
+        draw_round_play_page()
+    with side:
+        draw_side_bar()
+
+    # ラウンドの成功・失敗や降参でページが変わったら、画面全体を描き直す
+    if st.session_state.page != "round_play":
+        st.rerun()
+
+
 def share_result_box(
     title: str, total: int, max_score: int, comment: str, url: str | None = None
 ):
@@ -516,45 +527,7 @@ def share_result_box(
         share_url += f"&url={urllib.parse.quote(url)}"
 
     st.markdown(
-        f"""
-        <div style="
-            background-color: #e0f7fa;
-            padding: 1.2rem 1.5rem;
-            border-radius: 10px;
-            margin-bottom: 2rem;
-            box-shadow: 0 2px 8px rgba(0, 0, 0, 0.1);
-            text-align: center;
-        ">
-            <div style="font-size: 1.2rem; color: #00796b; margin-bottom: 0.5rem; font-weight: 600;">
-                {title}
-            </div>
-            <div style="
-                font-size: 2.5rem;
-                font-weight: bold;
-                color: {score_color};
-                line-height: 1;
-                white-space: nowrap;
-                margin-bottom: 0.5rem;
-            ">
-                {total} <span style="font-size: 1rem; color: #555;">/ {max_score} 点</span>
-            </div>
-            <div style="font-size: 1rem; color: #444; margin-bottom: 1rem;">
-                {comment}
-            </div>
-            <a href="{share_url}" target="_blank" style="text-decoration:none;">
-                <button style="
-                    background-color:#000000;
-                    color:white;
-                    border:none;
-                    padding:0.5rem 1rem;
-                    border-radius:5px;
-                    cursor:pointer;
-                ">
-                    Xでシェアする
-                </button>
-            </a>
-        </div>
-        """,
+        share_result_html(title, total, max_score, comment, score_color, share_url),
         unsafe_allow_html=True,
     )
 
@@ -570,88 +543,23 @@ def draw_game_result():
     else:  # 低得点
         score_color = "#d32f2f"  # 赤色
 
-    components.html(
-        """
-    <div style="
-        width: 100%;
-        display: flex;
-        justify-content: center;
-        margin: 0.3rem 0 0.8rem 0;
-    ">
-        <h2 style="
-            font-size: 1.6rem;
-            font-weight: 700;
-            font-family: 'Segoe UI', 'Helvetica Neue', sans-serif;
-            color: #1e88e5;
-            margin: 0;
-        ">
-            <span style="filter: brightness(0) saturate(100%) invert(30%) sepia(100%) saturate(2000%) hue-rotate(180deg);">🎉</span>
-            結果発表
-            <span style="filter: brightness(0) saturate(100%) invert(30%) sepia(100%) saturate(2000%) hue-rotate(180deg);">🎉</span>
-        </h2>
-    </div>
-    """,
-        height=60,
-    )
+    st.markdown(RESULT_HEADER_HTML, unsafe_allow_html=True)
     title = get_result_title(st.session_state.area, total, max_score=MAX_ROUNDS * 20)
     comment = get_result_comment(total, max_score=MAX_ROUNDS * 20)
 
     share_result_box(title=title, total=total, max_score=100, comment=comment)
 
-    for i in range(MAX_ROUNDS):
-        if i < len(st.session_state.scores):
-            score = st.session_state.scores[i]
-            goal = (
-                st.session_state.goals[i]
-                if "goals" in st.session_state and i < len(st.session_state.goals)
-                else "？"
-            )
-            score_display = f"{score} / 20点"
-            score_ratio = score / 20
-        else:
-            score = 0
-            score_display = "－ / 20点"
-            goal = (
-                st.session_state.goals[i]
-                if "goals" in st.session_state and i < len(st.session_state.goals)
-                else "？"
-            )
-            score_ratio = 0
-
-        st.markdown(
-            textwrap.dedent(f"""
-                    <div style="
-                        border: 1px solid #ddd;
-                        border-radius: 8px;
-                        padding: 0.5rem 0.75rem;
-                        margin-bottom: 0.4rem;
-                        background-color: #f9f9f9;
-                        box-shadow: 1px 1px 4px rgba(0,0,0,0.03);
-                        font-size: 0.9rem;
-                        line-height: 1.3;
-                    ">
-                        <div style="display: flex; align-items: center; gap: 1rem;">
-                            <div style="font-weight: bold;">ラウンド {i + 1}</div>
-                            <div style="color: #1565c0;">目的地: <b>{goal}</b></div>
-                        </div>
-                        <div style="display: flex; align-items: center; justify-content: space-between; margin-top: 0.4rem;">
-                            <div>スコア: <b>{score_display}</b></div>
-                            <div style="flex-grow: 1; margin-left: 1rem; background: #eee; border-radius: 4px; overflow: hidden;">
-                                <div style="
-                                    height: 8px;
-                                    width: {score_ratio * 100}%;
-                                    background-color: #4db6ac;
-                                "></div>
-                            </div>
-                        </div>
-                    </div>
-                """),
-            unsafe_allow_html=True,
-        )
+    # ラウンドごとの結果カードはスコア記録時に作ってあるので、未プレイの分だけ作って1回で描画する
+    cards = st.session_state.score_cards + [
+        round_score_card(i, None)
+        for i in range(len(st.session_state.score_cards), MAX_ROUNDS)
+    ]
+    st.markdown("".join(cards), unsafe_allow_html=True)
 
     st.markdown("---")
 
     if st.button("🔙 エリア選択に戻る"):
+        reset_game_state()
         change_page("area_select")
         st.rerun()
 
@@ -664,11 +572,7 @@ if "page" not in st.session_state:
 if st.session_state.page == "area_select":
     draw_area_select_page()
 elif st.session_state.page == "round_play":
-    main, side = st.columns([5, 4])
-    with main:
-        draw_round_play_page()
-    with side:
-        draw_side_bar()
+    draw_round_play_fragment()
 elif st.session_state.page == "round_result_success":
     main, side = st.columns([5, 4])
     with main:
@@ -15,6 +15,8 @@ conflicts = stations[stations["station_g_cd"].isin(conflicting_groups)]
 # 表示
 for group_cd, group_df in conflicts.groupby("station_g_cd"):
     print(f"station_g_cd: {group_cd}")
-    for _, row in group_df.iterrows():
-        print(f" - {row['station_cd']} : {row['station_name']}")
+    for station_cd, station_name in zip(
+        group_df["station_cd"].values, group_df["station_name"].values
+    ):
+        print(f" - {station_cd} : {station_name}")
     print()
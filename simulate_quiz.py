@@ -2,53 +2,21 @@
 """
 生成されたクイズファイルを読み取って連結成分数をシミュレーションするスクリプト
 """
+import argparse
 import json
-from collections import deque
+import sys
+from functools import lru_cache
 
+from graph_csr import ComponentTracker, CsrGraph, load_graph
+from json_io import dump_json, load_json
 
-def load_graph_data():
-    """グラフデータを読み込む"""
-    with open("output/graph_tokyo_walking.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+GRAPH_FILE = "output/graph_tokyo_walking.json"
 
 
-def count_connected_components(graph, stations):
-    """
-    指定された駅集合における連結成分の個数を計算
-    
-    Args:
-        graph: グラフデータ
-        stations: 調べる駅のリスト
-    
-    Returns:
-        連結成分の個数
-    """
-    if not stations:
-        return 0
-    
-    station_set = set(stations)
-    visited = set()
-    components = 0
-    
-    for station in stations:
-        if station not in visited and station in graph:
-            # 新しい連結成分を発見
-            components += 1
-            
-            # BFSでこの連結成分の全ての駅を訪問
-            queue = deque([station])
-            visited.add(station)
-            
-            while queue:
-                current = queue.popleft()
-                
-                for edge in graph.get(current, {}).get("edges", []):
-                    neighbor = edge["station"]
-                    if neighbor in station_set and neighbor not in visited:
-                        visited.add(neighbor)
-                        queue.append(neighbor)
-    
-    return components
+@lru_cache(maxsize=1)
+def load_graph_data() -> CsrGraph:
+    """グラフデータをCSR形式で読み込む（2回目以降は読み込み済みのものを返す）"""
+    return load_graph(GRAPH_FILE)
 
 
 def simulate_quiz_progression(graph, quiz_data):
@@ -56,11 +24,13 @@ def simulate_quiz_progression(graph, quiz_data):
     クイズの進行をシミュレーションして連結成分数の推移を計算
     
     Args:
-        graph: グラフデータ
+        graph: グラフデータ（CSR形式）
         quiz_data: クイズデータ（start_stations, questions）
     
     Returns:
         dict: シミュレーション結果
+        （progression の各ステップには駅集合を持たせない. ステップ k の駅集合は
+        start_stations と最初の k 個の正解駅をつなげたもの）
     """
     start_stations = quiz_data["start_stations"]
     questions = quiz_data["questions"]
@@ -68,33 +38,40 @@ def simulate_quiz_progression(graph, quiz_data):
     # 正解駅のみを抽出（順序維持）
     correct_questions = [q for q in questions if q["is_correct"]]
     
-    # スタート駅から開始
-    current_stations = start_stations.copy()
+    # 駅名は最初にまとめて駅IDへ変換しておく（グラフにない駅は -1 で、連結成分に含めない）
+    name_to_id = graph.name_to_id
+    start_ids = [name_to_id.get(station, -1) for station in start_stations]
+    answer_ids = [name_to_id.get(q["station"], -1) for q in correct_questions]
+    
+    # 駅を追加するたびに連結成分数を数え直さず、Union-Findで差分だけ更新する
+    tracker = ComponentTracker(graph)
     
     # 連結成分数の推移を記録
     progression = []
     
     # 初期状態
-    initial_components = count_connected_components(graph, current_stations)
+    for station_id in start_ids:
+        if station_id >= 0:
+            tracker.add(station_id)
+    initial_components = tracker.components
     progression.append({
         "step": 0,
         "added_station": None,
-        "current_stations": current_stations.copy(),
         "connected_components": initial_components
     })
     
     max_components = initial_components
     
     # 正解駅を順次追加
-    for i, question in enumerate(correct_questions, 1):
+    for i, (question, station_id) in enumerate(zip(correct_questions, answer_ids), 1):
         station = question["station"]
-        current_stations.append(station)
-        components = count_connected_components(graph, current_stations)
+        if station_id >= 0:
+            tracker.add(station_id)
+        components = tracker.components
         
         progression.append({
             "step": i,
             "added_station": station,
-            "current_stations": current_stations.copy(),
             "connected_components": components
         })
         
@@ -120,8 +97,7 @@ def analyze_all_quizzes(quiz_file_path):
         分析結果のリスト
     """
     # クイズデータを読み込み
-    with open(quiz_file_path, "r", encoding="utf-8") as f:
-        quizzes = json.load(f)
+    quizzes = load_json(quiz_file_path)
     
     # グラフデータを読み込み
     graph = load_graph_data()
@@ -132,22 +108,24 @@ def analyze_all_quizzes(quiz_file_path):
     print("=" * 60)
     
     for i, quiz in enumerate(quizzes, 1):
-        print(f"\n🔍 クイズ {i} 分析中...")
-        
         result = simulate_quiz_progression(graph, quiz)
         results.append(result)
         
-        # 結果表示
-        print(f"  スタート駅: {result['start_stations']}")
-        print(f"  正解駅数: {result['total_correct_stations']} 駅")
-        print(f"  シミュレーション最大連結成分数: {result['max_connected_components']}")
-        print(f"  データ記録値: {result['actual_max_from_data']}")
-        
         # 値が一致しているかチェック
         if result['max_connected_components'] == result['actual_max_from_data']:
-            print("  ✅ 値が一致")
+            match_message = "  ✅ 値が一致"
         else:
-            print("  ⚠️ 値が不一致")
+            match_message = "  ⚠️ 値が不一致"
+        
+        # 結果表示（1クイズ分をまとめて1回で出力する）
+        print("\n".join([
+            f"\n🔍 クイズ {i} 分析中...",
+            f"  スタート駅: {result['start_stations']}",
+            f"  正解駅数: {result['total_correct_stations']} 駅",
+            f"  シミュレーション最大連結成分数: {result['max_connected_components']}",
+            f"  データ記録値: {result['actual_max_from_data']}",
+            match_message,
+        ]))
     
     return results
 
@@ -160,8 +138,7 @@ def show_detailed_progression(result, quiz_index):
         result: シミュレーション結果
         quiz_index: クイズ番号
     """
-    print(f"\n📈 クイズ {quiz_index} の詳細推移:")
-    print("-" * 50)
+    lines = [f"\n📈 クイズ {quiz_index} の詳細推移:", "-" * 50]
     
     for step_data in result["progression"]:
         step = step_data["step"]
@@ -169,11 +146,13 @@ def show_detailed_progression(result, quiz_index):
         components = step_data["connected_components"]
         
         if step == 0:
-            print(f"初期状態: 連結成分数 {components}")
+            lines.append(f"初期状態: 連結成分数 {components}")
         else:
-            print(f"ステップ {step}: {station} 追加 → 連結成分数 {components}")
+            lines.append(f"ステップ {step}: {station} 追加 → 連結成分数 {components}")
     
-    print(f"\n最大連結成分数: {result['max_connected_components']}")
+    lines.append(f"\n最大連結成分数: {result['max_connected_components']}")
+    # 推移はまとめて1回で出力する
+    print("\n".join(lines))
 
 
 def export_results(results, output_file):
@@ -184,19 +163,56 @@ def export_results(results, output_file):
         results: 分析結果のリスト
         output_file: 出力ファイル名
     """
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    dump_json(results, output_file)
     
     print(f"\n💾 結果を {output_file} に保存しました")
 
 
 def main():
     """メイン関数"""
+    parser = argparse.ArgumentParser(
+        description="クイズファイルの連結成分数の推移をシミュレーション",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+例:
+  %(prog)s --quiz-file quizzes_central_10.json                   # 統計情報のみ
+  %(prog)s --quiz-file quizzes_central_10.json --detail 3        # 3問目の推移も表示
+  %(prog)s --quiz-file quizzes_central_10.json --export out.json # 結果をJSONに出力
+
+オプションを省略した項目は、端末から実行した場合のみ対話的に入力を求める
+        """
+    )
+    
+    parser.add_argument(
+        "--quiz-file",
+        type=str,
+        help="クイズファイル名 (デフォルト: quizzes_central_10.json)"
+    )
+    
+    parser.add_argument(
+        "--detail",
+        type=int,
+        help="詳細な推移を表示するクイズ番号"
+    )
+    
+    parser.add_argument(
+        "--export",
+        type=str,
+        help="シミュレーション結果を出力するJSONファイル"
+    )
+    
+    args = parser.parse_args()
+    
+    # パイプや並列実行では入力待ちで止まらないよう、端末からの実行時だけ対話する
+    interactive = sys.stdin.isatty()
+    
     print("🎯 クイズシミュレーションスクリプト")
     print("=" * 40)
     
     # 入力ファイルを指定
-    quiz_file = input("クイズファイル名を入力してください [quizzes_central_10.json]: ").strip()
+    quiz_file = args.quiz_file
+    if quiz_file is None and interactive:
+        quiz_file = input("クイズファイル名を入力してください [quizzes_central_10.json]: ").strip()
     if not quiz_file:
         quiz_file = "quizzes_central_10.json"
     
@@ -222,16 +238,21 @@ def main():
             print(f"データとの一致率: {match_rate:.1f}% ({matches}/{len(results)})")
         
         # 詳細表示オプション
-        show_detail = input("\n詳細な推移を表示しますか？ (クイズ番号を入力、Enterでスキップ): ").strip()
-        if show_detail.isdigit():
-            quiz_num = int(show_detail)
-            if 1 <= quiz_num <= len(results):
-                show_detailed_progression(results[quiz_num - 1], quiz_num)
+        quiz_num = args.detail
+        if quiz_num is None and interactive:
+            show_detail = input("\n詳細な推移を表示しますか？ (クイズ番号を入力、Enterでスキップ): ").strip()
+            if show_detail.isdigit():
+                quiz_num = int(show_detail)
+        if quiz_num is not None and 1 <= quiz_num <= len(results):
+            show_detailed_progression(results[quiz_num - 1], quiz_num)
         
         # 結果出力オプション
-        export_option = input("\n結果をJSONファイルに出力しますか？ (y/N): ").strip().lower()
-        if export_option == 'y':
-            output_file = f"simulation_results_{quiz_file.replace('.json', '')}.json"
+        output_file = args.export
+        if output_file is None and interactive:
+            export_option = input("\n結果をJSONファイルに出力しますか？ (y/N): ").strip().lower()
+            if export_option == 'y':
+                output_file = f"simulation_results_{quiz_file.replace('.json', '')}.json"
+        if output_file:
             export_results(results, output_file)
         
     except FileNotFoundError:
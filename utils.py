@@ -1,127 +1,187 @@
 import random
 import urllib
-from collections import deque
-from typing import Dict, List, Set
+from functools import lru_cache
+from typing import Iterable, NamedTuple, Set
 
-from pydantic import BaseModel
+from graph_csr import CsrGraph, multi_source_distances
 
 
-def choose_goal(visited: list[str], candidates: set[str]) -> str:
-    return random.choice(list(candidates.difference(set(visited))))
+# 目的地候補を引き直す回数の上限. 訪問済みの駅は候補のごく一部なので、通常は1-2回で決まる
+GOAL_DRAW_ATTEMPTS = 32
 
 
-class Edge(BaseModel):
+@lru_cache(maxsize=16)
+def _goal_pool(candidates: frozenset[str]) -> tuple[str, ...]:
+    # candidates はエリアごとに1つの共有frozensetなので、エリア数分しかキーができない
+    return tuple(candidates)
+
+
+def choose_goal(visited: set[str], candidates: frozenset[str]) -> str:
+    """訪問済みでない目的地候補から1駅を一様ランダムに選ぶ."""
+    # エリアの候補全体から引き、訪問済みなら引き直す（棄却しても未訪問の候補の中では一様）
+    pool = _goal_pool(candidates)
+    for _ in range(GOAL_DRAW_ATTEMPTS):
+        goal = random.choice(pool)
+        if goal not in visited:
+            return goal
+    # 候補の大半が訪問済みのときだけ、未訪問の候補を列挙して選ぶ
+    return random.choice(tuple(candidates.difference(visited)))
+
+
+class Edge(NamedTuple):
     from_station: str
     to_station: str
     line: str
 
 
 def add_candidates(
-    candidates: list[Edge],
-    visited_station: str,
-    graph_data: dict[str, list[dict[str, str]]],
-    visited_stations: list[str],
-) -> list[Edge]:
-    edges_to_be_added = list(
-        [
-            Edge(
-                from_station=visited_station,
-                to_station=item["station"],
-                line=item["line"],
-            )
-            for item in graph_data[visited_station]
-        ]
+    candidates: dict[str, list[Edge]],
+    visited_stations_to_add: Iterable[str],
+    graph_data: CsrGraph,
+    visited_stations: set[str],
+) -> dict[str, list[Edge]]:
+    """訪問した駅(複数可)から出る路線を、行き先の駅ごとにまとめて候補に追加する."""
+    names, indptr, indices, lines = (
+        graph_data.names,
+        graph_data.indptr,
+        graph_data.indices,
+        graph_data.lines,
     )
-    combined = candidates + edges_to_be_added
-
-    filtered = [edge for edge in combined if edge.to_station not in visited_stations]
+    for visited_station in visited_stations_to_add:
+        # 訪問済みになった駅への候補は不要になる
+        candidates.pop(visited_station, None)
+
+        station_id = graph_data.name_to_id[visited_station]
+        for position in range(indptr[station_id], indptr[station_id + 1]):
+            to_station = names[indices[position]]
+            if to_station in visited_stations:
+                continue
+            candidates.setdefault(to_station, []).append(
+                Edge(visited_station, to_station, lines[position])
+            )
 
-    return filtered
+    return candidates
 
 
 def find_shortest_path(
-    graph: Dict[str, List[Dict]], goal: str, visited: List[str]
+    graph: CsrGraph, goal: str, visited: Set[str]
 ) -> list[tuple[str, str | None]] | None:
-    queue = deque()
-    visited_set: Set[str] = set()
-    prev: dict[str, tuple[str | None, str | None]] = {}
-
-    queue.append(goal)
-    visited_set.add(goal)
-    prev[goal] = (None, None)
-
-    while queue:
-        current = queue.popleft()
-
-        if current in visited:
-            path: list[tuple[str, str | None]] = []
-            while current is not None:
-                prev_station, line = prev[current]
-                path.append((current, line))
-                current = prev_station
-            return path
-
-        for edge in graph.get(current, []):
-            neighbor = edge["station"]
-            line = edge["line"]
-
-            if neighbor not in visited_set:
-                visited_set.add(neighbor)
-                queue.append(neighbor)
-                prev[neighbor] = (current, line)
-
-    return None
-
-
-def _find_shortest_paths_to_visited_stations(
-    graph: Dict[str, List[Dict]], goal: str, visited: List[str], top_n=int
-) -> List[List[tuple[str, str | None]]]:
-    queue = deque()
-    visited_set: Set[str] = set()
-    prev: dict[str, tuple[str | None, str | None]] = {}
-
-    queue.append(goal)
-    visited_set.add(goal)
-    prev[goal] = (None, None)
-
-    found_paths: List[List[tuple[str, str | None]]] = []
-    visited_targets = set(visited)
-    found_stations: Set[str] = set()  # 記録する出発駅
-
-    while queue and len(found_stations) < top_n:
-        current = queue.popleft()
-
-        if current in visited_targets and current not in found_stations:
-            # reconstruct path
-            path: List[tuple[str, str | None]] = []
-            temp = current
-            while temp is not None:
-                prev_station, line = prev[temp]
-                path.append((temp, line))
-                temp = prev_station
-            found_paths.append(path)
-            found_stations.add(current)
-
-        for edge in graph.get(current, []):
-            neighbor = edge["station"]
-            line = edge["line"]
-
-            if neighbor not in visited_set:
-                visited_set.add(neighbor)
-                queue.append(neighbor)
-                prev[neighbor] = (current, line)
-
-    # sort paths by length (shortest first)
-    found_paths.sort(key=len)
-
-    return found_paths
-
-
-def calculate_hints(graph, goal, candidates, choices_num):
-    shortest_path_list = _find_shortest_paths_to_visited_stations(
-        graph=graph, goal=goal, visited=candidates, top_n=choices_num
+    """訪問済みの駅のいずれかから goal までの最短経路を双方向BFSで求める.
+
+    訪問済みの駅側と goal 側から1段ずつ、頂点数の少ない方の探索を広げ、
+    両側の探索が出会った駅で経路をつなぐ.
+
+    Returns:
+        [(駅, 次の駅への路線), ..., (goal, None)] の形の経路. 到達できなければ None
+    """
+    if goal in visited:
+        return [(goal, None)]
+    goal_id = graph.name_to_id.get(goal)
+    if goal_id is None:
+        return None
+
+    names, name_to_id, indptr, indices, lines = graph
+    n = len(names)
+
+    # 駅ID -> 探索元側の1つ前の駅ID (-1: 未到達) と、その駅との間のエッジの位置
+    prev_from_visited = [-1] * n
+    prev_from_goal = [-1] * n
+    edge_from_visited = [-1] * n
+    edge_from_goal = [-1] * n
+
+    frontier_visited = []
+    for station in visited:
+        station_id = name_to_id.get(station)
+        if station_id is not None and prev_from_visited[station_id] < 0:
+            prev_from_visited[station_id] = station_id
+            frontier_visited.append(station_id)
+    prev_from_goal[goal_id] = goal_id
+    frontier_goal = [goal_id]
+
+    meeting = -1
+    while frontier_visited and frontier_goal and meeting < 0:
+        # 小さい方のフロンティアを1段広げる
+        from_visited = len(frontier_visited) <= len(frontier_goal)
+        if from_visited:
+            frontier, own, own_edge, other = (
+                frontier_visited,
+                prev_from_visited,
+                edge_from_visited,
+                prev_from_goal,
+            )
+        else:
+            frontier, own, own_edge, other = (
+                frontier_goal,
+                prev_from_goal,
+                edge_from_goal,
+                prev_from_visited,
+            )
+
+        next_frontier = []
+        for current in frontier:
+            for position in range(indptr[current], indptr[current + 1]):
+                neighbor = indices[position]
+                if own[neighbor] >= 0:
+                    continue
+                own[neighbor] = current
+                own_edge[neighbor] = position
+                if other[neighbor] >= 0:
+                    meeting = neighbor
+                    break
+                next_frontier.append(neighbor)
+            if meeting >= 0:
+                break
+
+        if from_visited:
+            frontier_visited = next_frontier
+        else:
+            frontier_goal = next_frontier
+
+    if meeting < 0:
+        return None
+
+    # 訪問済みの駅 -> 出会った駅 の部分（各駅の路線は次の駅に記録されたエッジから引く）
+    path: list[tuple[str, str | None]] = []
+    current = meeting
+    line = None
+    while True:
+        path.append((names[current], line))
+        parent = prev_from_visited[current]
+        if parent == current:
+            break
+        line = lines[edge_from_visited[current]]
+        current = parent
+    path.reverse()
+
+    # 出会った駅 -> goal の部分
+    current = meeting
+    while current != goal_id:
+        path[-1] = (names[current], lines[edge_from_goal[current]])
+        current = prev_from_goal[current]
+        path.append((names[current], None))
+    return path
+
+
+def find_distances_from(graph: CsrGraph, source: str) -> dict[str, int]:
+    """source から到達できる各駅までの最短駅数を BFS で求める（BFSで到達した順に並ぶ）."""
+    names = graph.names
+    order, dist = multi_source_distances(
+        graph.indptr, graph.indices, [graph.name_to_id[source]]
     )
-    hints = [shortest_path[0][0] for shortest_path in shortest_path_list]
+    return {names[i]: dist[i] for i in order}
+
+
+def calculate_hints(goal_dist: dict[str, int], candidates: Iterable[str], choices_num: int):
+    """目的地に近い順に候補駅を choices_num 個選ぶ."""
+    # goal_dist は目的地からのBFSで到達した順に並んでいるので、
+    # 先頭から拾えばクリックのたびにBFSをやり直さずに済む
+    candidate_set = set(candidates)
+    hints = []
+    for station in goal_dist:
+        if len(hints) >= choices_num:
+            break
+        if station in candidate_set:
+            hints.append(station)
     # random.shuffle(hints) shuffleするとおかしくなる
     return hints
 
@@ -138,14 +198,10 @@ def calculate_score(
     fail_score: int = 0,
 ) -> tuple[int, str]:
     if actual_steps is None:
-        return fail_score
+        return fail_score, ""
 
     excess = actual_steps - shortest_steps
-    penalty = (
-        (actual_steps - shortest_steps) * penalty_per_step
-        + lost_life
-        + used_hints * penalty_per_hint
-    )
+    penalty = excess * penalty_per_step + lost_life + used_hints * penalty_per_hint
     raw_score = max_score - penalty
     header = f"{max_score}点 − (🚃 {excess} × {penalty_per_step} + 🩷 {lost_life} + 💡 {used_hints} × {penalty_per_hint})"
     result = (
@@ -158,13 +214,10 @@ def calculate_score(
     return max(raw_score, min_score), explanation
 
 
-def calculate_score_on_failure(graph_data, goal, visited, shortest_path):
-    shortest_path_of_end_state = find_shortest_path(
-        graph=graph_data,
-        goal=goal,
-        visited=visited,
-    )
-    progress_steps = len(shortest_path) - len(shortest_path_of_end_state)
+def calculate_score_on_failure(goal_dist, visited, initial_min_dist):
+    # ラウンド開始時に求めた目的地からの距離を引くだけで済ませ、BFSをやり直さない
+    end_min_dist = min(goal_dist[station] for station in visited if station in goal_dist)
+    progress_steps = initial_min_dist - end_min_dist
 
     score = min(progress_steps, 10)
     return score, progress_steps
@@ -199,9 +252,15 @@ def get_result_comment(score: int, max_score: int):
         return "もう一回トライ！出発進行〜🚃"
 
 
-def create_text_for_x(score: int, title: str, max_score: int) -> str:
-    lines = []
+@lru_cache(maxsize=64)
+def _encoded_share_suffix(title: str) -> str:
+    # ハッシュタグとURLはタイトルごとに同じなので、エンコード結果を使い回す
+    hashtags = f"#{title} #駅つなぎ"
+    url = "https://eki-tsunagi.smartbowwow.com"
+    return urllib.parse.quote(f"\n\n{hashtags}\n\n{url}")
+
 
+def create_text_for_x(score: int, title: str, max_score: int) -> str:
     ratio = score / max_score
     if score == max_score:
         content = "駅つなぎで満点出してしまった💯"
@@ -214,15 +273,5 @@ def create_text_for_x(score: int, title: str, max_score: int) -> str:
     else:
         content = f"駅つなぎで{score}点とった！目指せ高得点！🫣"
 
-    lines.append(content)
-
-    # ハッシュタグ（例）
-    hashtags = f"#{title} #駅つなぎ"
-    lines.append(f"\n{hashtags}")
-
-    url = "https://eki-tsunagi.smartbowwow.com"
-    lines.append(f"\n{url}")
-
-    # 最終テキストを結合
-    result = "\n".join(lines)
-    return urllib.parse.quote(result)
+    # quote は1文字ずつ変換するので、本文とハッシュタグ・URLを別々にエンコードしてつなげても同じ結果になる
+    return urllib.parse.quote(content) + _encoded_share_suffix(title)